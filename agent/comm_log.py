@@ -1,64 +1,248 @@
 from __future__ import annotations
 
-from dataclasses import asdict
+from collections import deque
+from dataclasses import asdict, fields
 from datetime import datetime, timezone
-import json
+from itertools import islice
+from typing import BinaryIO, Iterator
+import atexit
+import io
+import mmap
 import os
+import threading
 from uuid import uuid4
 
-from .models import CommMessage
+from . import fastjson
+from .models import CommMessage, TraceBuffer, TraceEvent
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+_MESSAGE_FIELDS = tuple(field.name for field in fields(CommMessage))
+_MESSAGE_DECODER = msgspec.json.Decoder(CommMessage) if msgspec is not None else None
+_FLUSH_EVERY_LINES = 8
+_RECENT_JULES_LIMIT = 3
 
 
 class CommLog:
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, trace: TraceBuffer | None = None) -> None:
         self.path = path
+        self.trace = trace
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         self._messages: list[CommMessage] = []
+        self._by_id: dict[str, CommMessage] = {}
+        self._encoded: dict[str, bytes] = {}
         self._external_ids: set[str] = set()
+        self._user_external_ids: set[str] = set()
+        self._unread_user: dict[str, CommMessage] = {}
+        self._history_lines: dict[str | None, list[str]] = {}
+        self._recent_jules: dict[str | None, deque[CommMessage]] = {}
+        self._dirty_ops = 0
+        self._missing_newline = False
+        # One reentrant lock covers the indices and the append handle; UI threads and the loop share them.
+        self._lock = threading.RLock()
         self._load()
+        self._handle: BinaryIO | None = None
+        self._pending_lines = 0
+        atexit.register(self.close)
 
     def _load(self) -> None:
-        directory = os.path.dirname(self.path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
         if not os.path.isfile(self.path):
             return
+        skipped = 0
         try:
-            with open(self.path, "r", encoding="utf-8") as handle:
-                for line in handle:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    payload = json.loads(line)
-                    message = CommMessage(
-                        message_id=str(payload.get("message_id", "")),
-                        source=str(payload.get("source", "")),
-                        role=str(payload.get("role", "")),
-                        content=str(payload.get("content", "")),
-                        timestamp=str(payload.get("timestamp", "")),
-                        read=bool(payload.get("read", False)),
-                        external_id=payload.get("external_id"),
-                        session_id=payload.get("session_id"),
-                    )
-                    if message.external_id:
-                        self._external_ids.add(str(message.external_id))
-                    self._messages.append(message)
+            for line in self._iter_lines():
+                try:
+                    self._load_line(line)
+                except (ValueError, TypeError):
+                    skipped += 1
         except OSError:
             return
+        if skipped and self.trace is not None:
+            self.trace.add(
+                TraceEvent(
+                    kind="comm_log_error",
+                    message="Skipped undecodable comm log lines",
+                    payload={"path": self.path, "skipped": skipped},
+                )
+            )
 
-    def _append_line(self, message: CommMessage) -> None:
-        directory = os.path.dirname(self.path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
-        with open(self.path, "a", encoding="utf-8") as handle:
-            handle.write(json.dumps(asdict(message), ensure_ascii=True) + "\n")
+    def _load_line(self, line: bytes) -> None:
+        if _MESSAGE_DECODER is not None:
+            try:
+                message = _MESSAGE_DECODER.decode(line)
+            except msgspec.DecodeError:
+                pass
+            else:
+                self._index(message)
+                return
+        payload = fastjson.loads(line)
+        if not isinstance(payload, dict):
+            raise ValueError("comm log line is not an object")
+        op = payload.get("op")
+        if op is not None:
+            self._apply_op(op, payload)
+            self._dirty_ops += 1
+            return
+        if tuple(payload) == _MESSAGE_FIELDS:
+            message = CommMessage(**payload)
+            self._encoded[message.message_id] = line
+            self._index(message)
+            return
+        message = CommMessage(
+            message_id=str(payload.get("message_id", "")),
+            source=str(payload.get("source", "")),
+            role=str(payload.get("role", "")),
+            content=str(payload.get("content", "")),
+            timestamp=str(payload.get("timestamp", "")),
+            read=bool(payload.get("read", False)),
+            external_id=payload.get("external_id"),
+            session_id=payload.get("session_id"),
+        )
+        self._index(message)
+
+    def _iter_lines(self) -> Iterator[bytes]:
+        fd = os.open(self.path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                return
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as view:
+                # A crash mid-write can leave a torn last line; terminate it before appending.
+                self._missing_newline = view[size - 1 : size] != b"\n"
+                pos = 0
+                while pos < size:
+                    end = view.find(b"\n", pos)
+                    if end == -1:
+                        end = size
+                    line = view[pos:end].strip()
+                    pos = end + 1
+                    if line:
+                        yield line
+        finally:
+            os.close(fd)
+
+    def _index(self, message: CommMessage) -> None:
+        self._messages.append(message)
+        self._by_id[message.message_id] = message
+        if message.external_id:
+            external_id = str(message.external_id)
+            self._external_ids.add(external_id)
+            if message.role == "user":
+                self._user_external_ids.add(external_id)
+        if message.role == "user" and not message.read:
+            self._unread_user[message.message_id] = message
+        if message.source == "jules":
+            recent = self._recent_jules.get(message.session_id)
+            if recent is None:
+                recent = deque(maxlen=_RECENT_JULES_LIMIT)
+                self._recent_jules[message.session_id] = recent
+            recent.append(message)
+        if self._history_lines:
+            line = self._format_line(message)
+            for session_id, lines in self._history_lines.items():
+                if self._in_history(message, session_id):
+                    lines.append(line)
+
+    @staticmethod
+    def _format_line(message: CommMessage) -> str:
+        return f"{message.timestamp} [{message.source}:{message.role}] {message.content}"
+
+    @staticmethod
+    def _in_history(message: CommMessage, session_id: str | None) -> bool:
+        return not session_id or message.source != "jules" or message.session_id == session_id
+
+    def _apply_op(self, op: str, payload: dict) -> int:
+        if op == "mark_read":
+            changed = 0
+            for message_id in payload.get("ids", []):
+                msg = self._by_id.get(str(message_id))
+                if msg is not None and not msg.read:
+                    msg.read = True
+                    self._encoded.pop(msg.message_id, None)
+                    self._unread_user.pop(msg.message_id, None)
+                    changed += 1
+            return changed
+        if op == "purge_user":
+            before = len(self._messages)
+            self._messages = [msg for msg in self._messages if msg.role != "user"]
+            self._by_id = {msg.message_id: msg for msg in self._messages}
+            self._encoded = {
+                message_id: data for message_id, data in self._encoded.items() if message_id in self._by_id
+            }
+            self._external_ids -= self._user_external_ids
+            self._user_external_ids.clear()
+            self._unread_user.clear()
+            self._history_lines.clear()
+            self._recent_jules.clear()
+            for msg in self._messages:
+                if msg.source == "jules":
+                    self._recent_jules.setdefault(msg.session_id, deque(maxlen=_RECENT_JULES_LIMIT)).append(msg)
+            return before - len(self._messages)
+        return 0
+
+    def _encode(self, message: CommMessage) -> bytes:
+        data = self._encoded.get(message.message_id)
+        if data is None:
+            data = fastjson.dumps(asdict(message))
+            self._encoded[message.message_id] = data
+        return data
+
+    def _append_bytes(self, data: bytes, flush: bool = True) -> None:
+        with self._lock:
+            if self._handle is None:
+                self._handle = open(self.path, "ab", buffering=io.DEFAULT_BUFFER_SIZE * 4)
+                if self._missing_newline:
+                    self._handle.write(b"\n")
+                    self._missing_newline = False
+            self._handle.write(data + b"\n")
+            self._pending_lines += 1
+            if flush or self._pending_lines >= _FLUSH_EVERY_LINES:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._handle is not None:
+            self._handle.flush()
+        self._pending_lines = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            self._pending_lines = 0
+
+    def _append_line(self, message: CommMessage, flush: bool = True) -> None:
+        self._append_bytes(self._encode(message), flush)
+
+    def _append_op(self, record: dict) -> None:
+        with self._lock:
+            self._append_bytes(fastjson.dumps(record))
+            self._dirty_ops += 1
+            if self._dirty_ops > max(1000, len(self._messages) // 4):
+                self._rewrite()
 
     def _rewrite(self) -> None:
-        directory = os.path.dirname(self.path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
-        with open(self.path, "w", encoding="utf-8") as handle:
-            for message in self._messages:
-                handle.write(json.dumps(asdict(message), ensure_ascii=True) + "\n")
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            self._pending_lines = 0
+            with open(self.path, "wb") as handle:
+                for message in self._messages:
+                    handle.write(self._encode(message) + b"\n")
+            self._missing_newline = False
+            self._dirty_ops = 0
 
     def append(
         self,
@@ -69,9 +253,8 @@ class CommLog:
         external_id: str | None = None,
         session_id: str | None = None,
         timestamp: str | None = None,
+        flush: bool = True,
     ) -> CommMessage | None:
-        if external_id and external_id in self._external_ids:
-            return None
         message = CommMessage(
             message_id=str(uuid4()),
             source=source,
@@ -82,46 +265,57 @@ class CommLog:
             external_id=external_id,
             session_id=session_id,
         )
-        self._messages.append(message)
-        if external_id:
-            self._external_ids.add(external_id)
-        self._append_line(message)
+        with self._lock:
+            if external_id and external_id in self._external_ids:
+                return None
+            self._index(message)
+            self._append_line(message, flush)
         return message
 
     def list_messages(self) -> list[CommMessage]:
-        return list(self._messages)
+        with self._lock:
+            return list(self._messages)
 
     def recent_user_messages(self, limit: int = 3) -> list[CommMessage]:
-        messages = [msg for msg in self._messages if msg.role == "user"]
-        return messages[-limit:]
+        if limit <= 0:
+            return []
+        with self._lock:
+            messages = list(islice((msg for msg in reversed(self._messages) if msg.role == "user"), limit))
+        messages.reverse()
+        return messages
+
+    def recent_jules_messages(self, session_id: str | None) -> list[CommMessage]:
+        with self._lock:
+            return list(self._recent_jules.get(session_id, ()))
 
     def unread_user_messages(self) -> list[CommMessage]:
-        return [msg for msg in self._messages if msg.role == "user" and not msg.read]
+        with self._lock:
+            return list(self._unread_user.values())
 
     def mark_read(self, message_ids: list[str]) -> None:
-        updated = False
-        for msg in self._messages:
-            if msg.message_id in message_ids and not msg.read:
-                msg.read = True
-                updated = True
-        if updated:
-            self._rewrite()
+        record = {"op": "mark_read", "ids": list(message_ids)}
+        with self._lock:
+            if self._apply_op("mark_read", record):
+                self._append_op(record)
 
     def history_text(self, session_id: str | None = None) -> str:
-        lines = []
-        for msg in self._messages:
-            if session_id and msg.source == "jules" and msg.session_id != session_id:
-                continue
-            lines.append(f"{msg.timestamp} [{msg.source}:{msg.role}] {msg.content}")
-        return "\n".join(lines)
+        key = session_id or None
+        with self._lock:
+            lines = self._history_lines.get(key)
+            if lines is None:
+                lines = [self._format_line(msg) for msg in self._messages if self._in_history(msg, key)]
+                self._history_lines[key] = lines
+            return "\n".join(lines)
 
     def snapshot(self) -> list[dict]:
-        return [asdict(message) for message in self._messages]
+        with self._lock:
+            encoded = [self._encode(message) for message in self._messages]
+        return [fastjson.loads(data) for data in encoded]
 
     def purge_user_messages(self) -> int:
-        before = len(self._messages)
-        self._messages = [msg for msg in self._messages if msg.role != "user"]
-        self._external_ids = {msg.external_id for msg in self._messages if msg.external_id}
-        if len(self._messages) != before:
-            self._rewrite()
-        return before - len(self._messages)
+        record = {"op": "purge_user"}
+        with self._lock:
+            removed = self._apply_op("purge_user", record)
+            if removed:
+                self._append_op(record)
+        return removed
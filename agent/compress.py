@@ -1,30 +1,87 @@
 from __future__ import annotations
 
-from typing import Iterable
-import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
 
+from . import fastjson
 from .config import CompressionConfig
 from .llm import LlmClient
 from .models import TraceBuffer, TraceEvent
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_ENCODING = None
+if tiktoken is not None:
+    # Resolve once at import: get_encoding may fetch the BPE file, which must not happen per loop iteration.
+    try:
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        _ENCODING = None
+# Above this size, fall back to the same 4-chars-per-token heuristic chunk_spans uses.
+_EXACT_TOKENS_MAX_CHARS = 16_000
+
+_COMM_HISTORY_PROMPT = (
+    "Summarize the communication history. Preserve decisions, open questions, and action items. "
+    "Be concise and avoid repetition."
+)
+
+_GOALS_PLANS_PROMPT = (
+    "Maintain the goals and plan for the project manager. "
+    "Only change the goals or plan if the events indicate a goal was reached, failed, or needs revision. "
+    "Do not include internal maintenance steps like compression or summarization in goals or plans."
+)
+
+_ROLLING_CONTEXT_PROMPT = (
+    "Update the rolling context for a project manager. "
+    "Preserve the most important facts, decisions, and current state. "
+    "Fold in new events, remove stale details, and keep it concise."
+)
+
+_UNREAD_RESPONSE_PROMPT = (
+    "You are LocalProjectManager. Respond to unread user messages. "
+    "Use this format:\n"
+    "Response:\n"
+    "- Summary: <short summary>\n"
+    "- Actions:\n"
+    "  - <action 1>\n"
+    "  - <action 2>\n"
+    "- Questions:\n"
+    "  - <question 1>\n"
+    "Keep it concise and actionable."
+)
+
+_AGENT_TURN_PROMPT = (
+    "You are LocalProjectManager. Produce a strict JSON object only, with keys: "
+    "mess_out_USER, mess_out_JULES, mess_out_LOG. "
+    "mess_out_USER is a concise user-facing message (empty if no unread messages). "
+    "mess_out_JULES is an object with fields: action (sendMessage|startSession|none) "
+    "and payload (object). If no action, use action=\"none\" and empty payload. "
+    "mess_out_LOG is a concise log message describing the last action taken; it must be non-empty. "
+    "Output JSON only, no extra text."
+)
+
 
 def estimate_tokens(text: str) -> int:
     if not text:
         return 0
+    if _ENCODING is not None and len(text) <= _EXACT_TOKENS_MAX_CHARS:
+        return max(1, len(_ENCODING.encode_ordinary(text)))
     return max(1, len(text) // 4)
 
 
-def chunk_text(text: str, max_tokens: int) -> list[str]:
+def chunk_spans(text: str, max_tokens: int) -> list[tuple[int, int]]:
     if not text:
         return []
     approx_chars = max_tokens * 4
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + approx_chars)
-        chunks.append(text[start:end])
-        start = end
-    return chunks
+    length = len(text)
+    return [(start, min(length, start + approx_chars)) for start in range(0, length, approx_chars)]
+
+
+def chunk_text(text: str, max_tokens: int) -> list[str]:
+    return [text[start:end] for start, end in chunk_spans(text, max_tokens)]
 
 
 class CompressionPipeline:
@@ -48,49 +105,65 @@ class CompressionPipeline:
             return ""
         target_total = target_total_tokens or self.config.target_total_tokens
         current = text
-        self._record("compress_start", "Starting compression", {"tokens": estimate_tokens(text)})
-        while estimate_tokens(current) > target_total:
-            chunks = chunk_text(current, self.config.max_input_tokens)
-            summaries = []
-            for idx, chunk in enumerate(chunks):
+        tokens = estimate_tokens(current)
+        self._record("compress_start", "Starting compression", {"tokens": tokens})
+        while tokens > target_total:
+            spans = chunk_spans(current, self.config.max_input_tokens)
+            summaries = self._summarize_spans(current, spans)
+            current = "\n\n".join(summaries)
+            tokens = estimate_tokens(current)
+            self._record("compress_pass", "Compression pass completed", {"tokens": tokens})
+            if len(spans) == 1:
+                break
+        self._record("compress_done", "Compression finished", {"tokens": tokens})
+        return current
+
+    def _summarize_spans(self, text: str, spans: list[tuple[int, int]]) -> list[str]:
+        def summarize_span(indexed: tuple[int, tuple[int, int]]) -> str:
+            idx, (start, end) = indexed
+            chunk = text[start:end]
+            if self.trace is not None:
                 self._record(
                     "compress_chunk",
                     "Summarizing chunk",
                     {"index": idx, "tokens": estimate_tokens(chunk)},
                 )
-                summaries.append(self.llm.summarize(chunk, self.config.target_chunk_tokens))
-            current = "\n\n".join(summaries)
-            self._record("compress_pass", "Compression pass completed", {"tokens": estimate_tokens(current)})
-            if len(chunks) == 1:
-                break
-        self._record("compress_done", "Compression finished", {"tokens": estimate_tokens(current)})
-        return current
+            return self.llm.summarize(chunk, self.config.target_chunk_tokens)
+
+        workers = min(len(spans), self.config.max_parallel_chunks)
+        if workers <= 1:
+            return [summarize_span(item) for item in enumerate(spans)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(summarize_span, enumerate(spans)))
 
     def compress_many(self, texts: Iterable[str], target_total_tokens: int | None = None) -> str:
         combined = "\n\n".join(texts)
         return self.compress(combined, target_total_tokens=target_total_tokens)
 
-    def summarize_comm_history(self, history_text: str, target_tokens: int = 1000) -> str:
+    def summarize_comm_history(
+        self,
+        history_text: str,
+        target_tokens: int = 1000,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
         if not history_text:
             return ""
-        system_prompt = (
-            "Summarize the communication history. Preserve decisions, open questions, and action items. "
-            "Be concise and avoid repetition."
-        )
         user_prompt = f"Target length: ~{target_tokens} tokens.\n\nHistory:\n{history_text}"
         return self.llm.chat_complete_streaming(
             [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _COMM_HISTORY_PROMPT},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
+            on_delta=on_delta,
         )
 
-    def update_goals_plans(self, current_text: str, events_text: str, target_tokens: int = 1000) -> str:
-        system_prompt = (
-            "Maintain the goals and plan for the project manager. "
-            "Only change the goals or plan if the events indicate a goal was reached, failed, or needs revision. "
-            "Do not include internal maintenance steps like compression or summarization in goals or plans."
-        )
+    def update_goals_plans(
+        self,
+        current_text: str,
+        events_text: str,
+        target_tokens: int = 1000,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
         user_prompt = (
             f"Target length: ~{target_tokens} tokens.\n\nCurrent goals and plan:\n{current_text}\n\n"
             f"New events:\n{events_text}\n\n"
@@ -98,17 +171,19 @@ class CompressionPipeline:
         )
         return self.llm.chat_complete_streaming(
             [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _GOALS_PLANS_PROMPT},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
+            on_delta=on_delta,
         )
 
-    def update_rolling_context(self, previous_text: str, events_text: str, target_tokens: int = 1200) -> str:
-        system_prompt = (
-            "Update the rolling context for a project manager. "
-            "Preserve the most important facts, decisions, and current state. "
-            "Fold in new events, remove stale details, and keep it concise."
-        )
+    def update_rolling_context(
+        self,
+        previous_text: str,
+        events_text: str,
+        target_tokens: int = 1200,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
         user_prompt = (
             f"Target length: ~{target_tokens} tokens.\n\nPrevious rolling context:\n{previous_text}\n\n"
             f"New events:\n{events_text}\n\n"
@@ -116,43 +191,34 @@ class CompressionPipeline:
         )
         return self.llm.chat_complete_streaming(
             [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _ROLLING_CONTEXT_PROMPT},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
+            on_delta=on_delta,
         )
 
-    def format_unread_response(self, messages_text: str, target_tokens: int = 300) -> str:
-        system_prompt = (
-            "You are LocalProjectManager. Respond to unread user messages. "
-            "Use this format:\n"
-            "Response:\n"
-            "- Summary: <short summary>\n"
-            "- Actions:\n"
-            "  - <action 1>\n"
-            "  - <action 2>\n"
-            "- Questions:\n"
-            "  - <question 1>\n"
-            "Keep it concise and actionable."
-        )
+    def format_unread_response(
+        self,
+        messages_text: str,
+        target_tokens: int = 300,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
         user_prompt = f"Target length: ~{target_tokens} tokens.\n\nUnread messages:\n{messages_text}"
         return self.llm.chat_complete_streaming(
             [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _UNREAD_RESPONSE_PROMPT},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
+            on_delta=on_delta,
         )
 
-    def agent_turn_output(self, turn_inputs: dict, unread_messages_text: str) -> str:
-        inputs_json = json.dumps(turn_inputs, ensure_ascii=True)
-        system_prompt = (
-            "You are LocalProjectManager. Produce a strict JSON object only, with keys: "
-            "mess_out_USER, mess_out_JULES, mess_out_LOG. "
-            "mess_out_USER is a concise user-facing message (empty if no unread messages). "
-            "mess_out_JULES is an object with fields: action (sendMessage|startSession|none) "
-            "and payload (object). If no action, use action=\"none\" and empty payload. "
-            "mess_out_LOG is a concise log message describing the last action taken; it must be non-empty. "
-            "Output JSON only, no extra text."
-        )
+    def agent_turn_output(
+        self,
+        turn_inputs: dict,
+        unread_messages_text: str,
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
+        inputs_json = fastjson.dumps(turn_inputs).decode("utf-8")
         user_prompt = (
             "Inputs (JSON):\n"
             f"{inputs_json}\n\n"
@@ -162,7 +228,8 @@ class CompressionPipeline:
         )
         return self.llm.chat_complete_streaming(
             [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _AGENT_TURN_PROMPT},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
+            on_delta=on_delta,
         )
@@ -30,6 +30,7 @@ class CompressionConfig:
     target_chunk_tokens: int = 1000
     target_total_tokens: int = 1000
     max_file_bytes: int = 2_000_000
+    max_parallel_chunks: int = 4
 
 
 @dataclass(frozen=True)
@@ -63,6 +64,8 @@ class RepoConfig:
 class UiConfig:
     host: str = "127.0.0.1"
     port: int = 8765
+    fsync_writes: bool = False
+    http_threads: int = 16
 
 
 @dataclass(frozen=True)
@@ -94,6 +97,7 @@ class AgentConfig:
             target_chunk_tokens=_env_int("LPM_TARGET_CHUNK_TOKENS", 1000),
             target_total_tokens=_env_int("LPM_TARGET_TOTAL_TOKENS", 1000),
             max_file_bytes=_env_int("LPM_MAX_FILE_BYTES", 2_000_000),
+            max_parallel_chunks=_env_int("LPM_MAX_PARALLEL_CHUNKS", 4),
         )
         llm = LlmConfig(
             base_url=os.getenv("LPM_LLM_BASE_URL", "http://localhost:8080"),
@@ -119,6 +123,8 @@ class AgentConfig:
         ui = UiConfig(
             host=os.getenv("LPM_UI_HOST", "127.0.0.1"),
             port=_env_int("LPM_UI_PORT", 8765),
+            fsync_writes=os.getenv("LPM_UI_FSYNC_WRITES", "0") != "0",
+            http_threads=_env_int("LPM_UI_HTTP_THREADS", 16),
         )
         loop = LoopConfig(
             poll_interval_seconds=_env_int("LPM_POLL_INTERVAL_SECONDS", 10),
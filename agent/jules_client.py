@@ -3,15 +3,29 @@ from __future__ import annotations
 import requests
 
 from .config import JulesConfig
+from .http_session import build_session
 from .models import JulesRequest, JulesStatus, PrInfo
 
+_ACTIVITY_CONTENT_KEYS = ("prompt", "message", "content", "text")
+_CONTAINER_CONTENT_KEYS = ("prompt", "message", "content", "description", "title")
+_ACTIVITY_CONTAINERS = (
+    ("messageSent", _CONTAINER_CONTENT_KEYS),
+    ("userMessage", _CONTAINER_CONTENT_KEYS),
+    ("assistantMessage", _CONTAINER_CONTENT_KEYS),
+    ("progressUpdated", _CONTAINER_CONTENT_KEYS),
+)
+
 
 class JulesClient:
     def __init__(self, config: JulesConfig) -> None:
         self.config = config
         self._google_api = "jules.googleapis.com" in config.base_url
+        self._session = build_session()
+        self._cached_headers = self._build_headers()
+        self._resolved_session_id: str | None = None
+        self._source_to_session: dict[str, str] = {}
 
-    def _headers(self) -> dict:
+    def _build_headers(self) -> dict:
         headers = {"Content-Type": "application/json"}
         if self.config.api_key:
             if self._google_api:
@@ -20,11 +34,14 @@ class JulesClient:
                 headers["Authorization"] = f"Bearer {self.config.api_key}"
         return headers
 
+    def _headers(self) -> dict:
+        return self._cached_headers
+
     def _url(self, path: str) -> str:
         return f"{self.config.base_url.rstrip('/')}{path}"
 
     def _get(self, path: str, params: dict | None = None) -> requests.Response:
-        return requests.get(
+        return self._session.get(
             self._url(path),
             headers=self._headers(),
             params=params,
@@ -32,7 +49,7 @@ class JulesClient:
         )
 
     def _post(self, path: str, payload: dict | None = None) -> requests.Response:
-        return requests.post(
+        return self._session.post(
             self._url(path),
             headers=self._headers(),
             json=payload,
@@ -46,17 +63,27 @@ class JulesClient:
             return self.config.session_id
         if not self._google_api:
             return None
+        if self._resolved_session_id:
+            return self._resolved_session_id
         response = self._get("/sessions", params={"pageSize": 1})
         response.raise_for_status()
         payload = response.json()
         sessions = payload.get("sessions", [])
         if not sessions:
             return None
-        return str(sessions[0].get("id") or sessions[0].get("name", "")).split("/")[-1]
+        self._resolved_session_id = str(sessions[0].get("id") or sessions[0].get("name", "")).split("/")[-1]
+        return self._resolved_session_id
+
+    def invalidate_session_cache(self) -> None:
+        self._resolved_session_id = None
+        self._source_to_session.clear()
 
     def resolve_session_id_for_source(self, source: str, page_size: int = 50) -> str | None:
         if not self._google_api or not source:
             return None
+        cached = self._source_to_session.get(source)
+        if cached:
+            return cached
         response = self._get("/sessions", params={"pageSize": page_size})
         response.raise_for_status()
         payload = response.json()
@@ -64,11 +91,15 @@ class JulesClient:
         for session in sessions:
             source_context = session.get("sourceContext", {})
             if source_context.get("source") == source:
-                return str(session.get("id") or session.get("name", "")).split("/")[-1]
+                session_id = str(session.get("id") or session.get("name", "")).split("/")[-1]
+                self._source_to_session[source] = session_id
+                return session_id
         return None
 
     def _get_session(self, session_id: str) -> dict:
         response = self._get(f"/sessions/{session_id}")
+        if response.status_code == 404:
+            self.invalidate_session_cache()
         response.raise_for_status()
         return response.json()
 
@@ -86,20 +117,15 @@ class JulesClient:
         return None
 
     def _extract_activity_content(self, activity: dict) -> str:
-        for key in ("prompt", "message", "content", "text"):
-            if key in activity and activity[key]:
-                return str(activity[key])
-        for container_key in (
-            "messageSent",
-            "userMessage",
-            "assistantMessage",
-            "progressUpdated",
-        ):
+        for key in _ACTIVITY_CONTENT_KEYS:
+            if value := activity.get(key):
+                return str(value)
+        for container_key, keys in _ACTIVITY_CONTAINERS:
             container = activity.get(container_key)
             if isinstance(container, dict):
-                for key in ("prompt", "message", "content", "description", "title"):
-                    if key in container and container[key]:
-                        return str(container[key])
+                for key in keys:
+                    if value := container.get(key):
+                        return str(value)
         return ""
 
     def get_status(self, session_id: str | None = None) -> JulesStatus:
@@ -195,6 +221,9 @@ class JulesClient:
             response.raise_for_status()
             payload = response.json()
             created_id = str(payload.get("id") or payload.get("name", "")).split("/")[-1]
+            if created_id:
+                self._resolved_session_id = created_id
+                self._source_to_session[source_name] = created_id
             return created_id or None
         payload = {"context": context}
         response = self._post("/start_session", payload)
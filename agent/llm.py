@@ -1,17 +1,47 @@
 from __future__ import annotations
 
-import json
-from typing import Iterable
-import requests
+import io
+from typing import Callable, Iterable
 
+from . import fastjson
 from .config import LlmConfig
+from .http_session import build_session
 from .models import TraceBuffer, TraceEvent
 
+_SSE_DATA_PREFIX = b"data: "
+_SSE_DATA_PREFIX_LEN = len(_SSE_DATA_PREFIX)
+_STREAM_BATCH_SIZE = 32
+_PREVIEW_MESSAGE_CHARS = 4000
+_PREVIEW_TOTAL_CHARS = 12000
+
+
+def _prompt_preview(messages: list[dict]) -> str:
+    parts: list[str] = []
+    total = 0
+    for msg in messages:
+        content = msg.get("content") or ""
+        if len(content) > _PREVIEW_MESSAGE_CHARS:
+            content = content[:_PREVIEW_MESSAGE_CHARS] + "\n...[truncated]"
+        block = f"[{msg.get('role') or 'unknown'}]\n{content}"
+        total += len(block)
+        if total > _PREVIEW_TOTAL_CHARS:
+            parts.append("...[prompt truncated]")
+            break
+        parts.append(block)
+    return "\n\n".join(parts)
+
 
 class LlmClient:
     def __init__(self, config: LlmConfig, trace: TraceBuffer | None = None) -> None:
         self.config = config
         self.trace = trace
+        self._session = build_session()
+        self._url = f"{config.base_url.rstrip('/')}/v1/chat/completions"
+        self._base_body = {
+            "model": config.model,
+            "temperature": config.temperature,
+            "max_tokens": config.max_tokens,
+        }
 
     def _record(self, kind: str, message: str, payload: dict | None = None) -> None:
         if self.trace is None:
@@ -19,16 +49,15 @@ class LlmClient:
         self.trace.add(TraceEvent(kind=kind, message=message, payload=payload))
 
     def chat_complete(self, messages: list[dict]) -> str:
-        url = f"{self.config.base_url.rstrip('/')}/v1/chat/completions"
-        body = {
-            "model": self.config.model,
-            "messages": messages,
-            "temperature": self.config.temperature,
-            "max_tokens": self.config.max_tokens,
-            "stream": False,
-        }
-        self._record("llm_request", "Sending chat completion", {"url": url, "body": body})
-        response = requests.post(
+        url = self._url
+        body = {**self._base_body, "messages": messages, "stream": False}
+        if self.trace is not None:
+            self._record(
+                "llm_request",
+                "Sending chat completion",
+                {"url": url, "body": body, "body_preview": _prompt_preview(messages)},
+            )
+        response = self._session.post(
             url,
             json=body,
             timeout=self.config.timeout_seconds,
@@ -38,51 +67,72 @@ class LlmClient:
         self._record("llm_response", "Chat completion received", {"response": payload})
         return payload["choices"][0]["message"]["content"]
 
-    def stream_chat_complete(self, messages: list[dict]) -> Iterable[str]:
-        url = f"{self.config.base_url.rstrip('/')}/v1/chat/completions"
-        body = {
-            "model": self.config.model,
-            "messages": messages,
-            "temperature": self.config.temperature,
-            "max_tokens": self.config.max_tokens,
-            "stream": True,
-        }
-        self._record("llm_request", "Sending streaming chat completion", {"url": url, "body": body})
-        with requests.post(
+    def iter_chat(self, messages: list[dict]) -> Iterable[str]:
+        url = self._url
+        body = {**self._base_body, "messages": messages, "stream": True}
+        if self.trace is not None:
+            self._record(
+                "llm_request",
+                "Sending streaming chat completion",
+                {"url": url, "body": body, "body_preview": _prompt_preview(messages)},
+            )
+        with self._session.post(
             url,
             json=body,
             stream=True,
             timeout=self.config.timeout_seconds,
         ) as response:
             response.raise_for_status()
-            for line in response.iter_lines(decode_unicode=True):
-                if not line:
-                    continue
-                if line.startswith("data: "):
-                    line = line[len("data: ") :]
-                if line.strip() == "[DONE]":
-                    break
-                try:
-                    payload = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                delta_payload = payload.get("choices", [{}])[0].get("delta", {})
-                delta = delta_payload.get("content")
-                channel = "content"
-                if not delta:
-                    delta = delta_payload.get("reasoning_content") or delta_payload.get("reasoning")
-                    channel = "reasoning"
-                if delta:
-                    self._record("llm_stream", "Streaming delta", {"delta": delta, "channel": channel})
+            tracing = self.trace is not None
+            pending: list[str] = []
+            pending_channel = "content"
+            try:
+                for line in response.iter_lines(decode_unicode=False):
+                    if not line:
+                        continue
+                    if line.startswith(_SSE_DATA_PREFIX):
+                        line = line[_SSE_DATA_PREFIX_LEN:]
+                    if line.strip() == b"[DONE]":
+                        break
+                    try:
+                        payload = fastjson.loads(line)
+                    except fastjson.JSONDecodeError:
+                        continue
+                    delta_payload = payload.get("choices", [{}])[0].get("delta", {})
+                    delta = delta_payload.get("content")
+                    channel = "content"
+                    if not delta:
+                        delta = delta_payload.get("reasoning_content") or delta_payload.get("reasoning")
+                        channel = "reasoning"
+                    if not delta:
+                        continue
+                    if tracing:
+                        if pending and (channel != pending_channel or len(pending) >= _STREAM_BATCH_SIZE):
+                            self._record_stream_batch(pending, pending_channel)
+                            pending = []
+                        pending.append(delta)
+                        pending_channel = channel
                     yield delta
+            finally:
+                if pending:
+                    self._record_stream_batch(pending, pending_channel)
+
+    def _record_stream_batch(self, deltas: list[str], channel: str) -> None:
+        self._record("llm_stream_batch", "Streaming deltas", {"deltas": deltas, "channel": channel})
 
-    def chat_complete_streaming(self, messages: list[dict]) -> str:
-        chunks: list[str] = []
-        for delta in self.stream_chat_complete(messages):
-            chunks.append(delta)
-        return "".join(chunks)
+    def chat_complete_streaming(
+        self,
+        messages: list[dict],
+        on_delta: Callable[[str], None] | None = None,
+    ) -> str:
+        buffer = io.StringIO()
+        for delta in self.iter_chat(messages):
+            buffer.write(delta)
+            if on_delta:
+                on_delta(delta)
+        return buffer.getvalue()
 
-    def summarize(self, text: str, target_tokens: int) -> str:
+    def summarize(self, text: str, target_tokens: int, on_delta: Callable[[str], None] | None = None) -> str:
         system_prompt = (
             "Summarize the input faithfully and concisely. "
             "Preserve decisions, requirements, and next actions."
@@ -95,5 +145,6 @@ class LlmClient:
             [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
+            on_delta=on_delta,
         )
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-import json
+import hashlib
 import os
 import sys
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
+from . import fastjson
 from .comm_log import CommLog
-from .compress import CompressionPipeline
+from .compress import CompressionPipeline, estimate_tokens
 from .config import AgentConfig
 from .jules_client import JulesClient
 from .llm import LlmClient
@@ -22,9 +24,17 @@ from .models import (
 )
 from .repo_manager import RepoManager
 
+_SUMMARY_CACHE_MAX_ENTRIES = 32
+COMPRESS_TOKEN_THRESHOLD = 4000
+_QUICK_ACK_MAX_MESSAGES = 2
+_QUICK_ACK_MAX_CHARS = 200
+_STATUS_FIELDS = frozenset({"llm_ready", "selected_source", "session_id", "system_message_locked"})
+
 
 class SharedState:
     def __init__(self) -> None:
+        self.status_version = 0
+        self.status_listener: Callable[[], None] | None = None
         self.interrupts: list[str] = []
         self.current_context: str = ""
         self.stop_requested: bool = False
@@ -39,6 +49,33 @@ class SharedState:
         self.llm_ready: bool = False
         self.last_agent_output: AgentTurnOutput | None = None
         self.no_jules_sessions: bool = False
+        self._static_key: tuple[str, str, str] | None = None
+        self._static_prefix: str = ""
+
+    def static_prefix(self) -> str:
+        key = (self.system_message, self.goals_plans, self.rolling_context)
+        if key != self._static_key:
+            self._static_prefix = "\n\n".join(
+                [
+                    "System Message:\n" + self.system_message,
+                    "Goals and Plans:\n" + self.goals_plans,
+                    "Rolling Context:\n" + self.rolling_context,
+                ]
+            )
+            self._static_key = key
+        return self._static_prefix
+
+    def __setattr__(self, name: str, value: object) -> None:
+        if name not in _STATUS_FIELDS:
+            object.__setattr__(self, name, value)
+            return
+        changed = getattr(self, name, None) != value
+        object.__setattr__(self, name, value)
+        # Bump after storing so a reader never caches the old value under the new version.
+        object.__setattr__(self, "status_version", self.status_version + 1)
+        listener = self.status_listener
+        if changed and listener is not None:
+            listener()
 
     def add_interrupt(self, message: str) -> None:
         self.interrupts.append(message)
@@ -73,39 +110,117 @@ class AgentLoop:
         self.comm_log = comm_log
         self.state = ProjectState()
         self.initialized = False
+        self._summary_cache_path = os.path.join(config.repo.repo_path, ".lpm", "summary_cache.json")
+        self._summary_cache: dict[str, str] | None = None
+        self._docs_cache: dict[str, tuple[int, int, tuple[str, ...]]] = {}
+        self._last_comm_hash: int | None = None
+        self._last_comm_summary = ""
+        self._last_goals_input_hash: int | None = None
+        self._last_rolling_input_hash: int | None = None
+        self._goals_seeded = False
+        self._rolling_seeded = False
+        self._last_turn_key: bytes | None = None
 
     def _record(self, kind: str, message: str, payload: dict | None = None) -> None:
-        timestamp = datetime.now().astimezone().isoformat()
-        self.trace.add(TraceEvent(kind=kind, message=message, payload=payload, timestamp=timestamp))
+        self.trace.add(TraceEvent(kind=kind, message=message, payload=payload))
+
+    def _read_doc_cached(self, path: str, stat: os.stat_result) -> tuple[str, ...] | None:
+        cached = self._docs_cache.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                fragments = ("File: ", os.path.relpath(path, self.config.repo.repo_path), "\n", handle.read())
+        except OSError:
+            return None
+        self._docs_cache[path] = (stat.st_mtime_ns, stat.st_size, fragments)
+        return fragments
+
+    def _scan_docs(self, directory: str, texts: list[str]) -> None:
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                        continue
+                    if not entry.name.lower().endswith((".md", ".txt")) or not entry.is_file():
+                        continue
+                    fragments = self._read_doc_cached(entry.path, entry.stat())
+                    if fragments is not None:
+                        texts.extend(fragments)
+                        texts.append("\n\n")
+        except OSError:
+            return
+        for subdir in subdirs:
+            self._scan_docs(subdir, texts)
 
     def _load_docs(self) -> str:
-        texts = []
+        texts: list[str] = []
         docs_path = os.path.join(self.config.repo.repo_path, self.config.docs.docs_path)
         if os.path.isdir(docs_path):
-            for root, _, files in os.walk(docs_path):
-                for name in files:
-                    if not name.lower().endswith((".md", ".txt")):
-                        continue
-                    full_path = os.path.join(root, name)
-                    try:
-                        with open(full_path, "r", encoding="utf-8") as handle:
-                            rel = os.path.relpath(full_path, self.config.repo.repo_path)
-                            texts.append(f"File: {rel}\n{handle.read()}")
-                    except OSError:
-                        continue
+            self._scan_docs(docs_path, texts)
         if self.config.docs.include_readme:
             readme_path = os.path.join(self.config.repo.repo_path, "README.md")
-            if os.path.isfile(readme_path):
-                with open(readme_path, "r", encoding="utf-8") as handle:
-                    texts.append(f"File: README.md\n{handle.read()}")
-        return "\n\n".join(texts)
+            try:
+                fragments = self._read_doc_cached(readme_path, os.stat(readme_path))
+            except OSError:
+                fragments = None
+            if fragments is not None:
+                texts.extend(fragments)
+                texts.append("\n\n")
+        return "".join(texts[:-1])
+
+    def _load_summary_cache(self) -> dict[str, str]:
+        if self._summary_cache is None:
+            self._summary_cache = {}
+            try:
+                with open(self._summary_cache_path, "rb") as handle:
+                    payload = fastjson.loads(handle.read())
+                if isinstance(payload, dict):
+                    self._summary_cache = {str(key): str(value) for key, value in payload.items()}
+            except (OSError, ValueError):
+                pass
+        return self._summary_cache
+
+    def _compress_cached(self, texts: list[str], target_total_tokens: int) -> str:
+        digest = hashlib.sha256(str(target_total_tokens).encode("utf-8"))
+        for text in texts:
+            digest.update(b"\x00")
+            digest.update(text.encode("utf-8"))
+        key = digest.hexdigest()
+        cache = self._load_summary_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            self._record("compress_cache_hit", "Reusing cached summary", {"key": key[:12]})
+            # Keep the dict in least-recently-used order; only persist when the order changes.
+            if next(reversed(cache)) != key:
+                cache[key] = cache.pop(key)
+                self._save_summary_cache()
+            return cached
+        summary = self.compression.compress_many(texts, target_total_tokens=target_total_tokens)
+        cache[key] = summary
+        while len(cache) > _SUMMARY_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+        self._save_summary_cache()
+        return summary
+
+    def _save_summary_cache(self) -> None:
+        tmp_path = self._summary_cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._summary_cache_path), exist_ok=True)
+            with open(tmp_path, "wb") as handle:
+                handle.write(fastjson.dumps(self._summary_cache))
+            os.replace(tmp_path, self._summary_cache_path)
+        except OSError as exc:
+            self._record("compress_cache_error", "Failed to persist summary cache", {"error": str(exc)})
 
     def _build_context(self, extra: str = "") -> str:
+        # Keep slow-changing sections first and per-turn content last so the
+        # prompt prefix stays stable across turns for server-side prompt caching.
         blocks = [
-            "System Message:\n" + self.shared_state.system_message,
+            self.shared_state.static_prefix(),
             "Communication Channel:\n" + self.shared_state.comm_channel,
-            "Goals and Plans:\n" + self.shared_state.goals_plans,
-            "Rolling Context:\n" + self.shared_state.rolling_context,
         ]
         if extra:
             blocks.append(extra)
@@ -116,6 +231,25 @@ class AgentLoop:
         self.shared_state.current_context = context
         return context
 
+    def bootstrap_session(self) -> bool:
+        try:
+            if not self.shared_state.session_id:
+                self.shared_state.session_id = self.jules.resolve_session_id_for_source(
+                    self.shared_state.selected_source
+                )
+            session_id = self.jules.start_session(
+                "Start session.",
+                session_id=self.shared_state.session_id,
+                source=self.shared_state.selected_source,
+            )
+        except Exception as exc:
+            self._record("session_error", "Session start failed", {"error": str(exc)})
+            return False
+        if session_id:
+            self.shared_state.session_id = session_id
+        self._record("session", "Session started", {"session_id": self.shared_state.session_id})
+        return True
+
     def _sync_jules_messages(self) -> None:
         if not self.shared_state.session_id and self.shared_state.selected_source:
             self.shared_state.session_id = self.jules.resolve_session_id_for_source(
@@ -132,19 +266,23 @@ class AgentLoop:
         except Exception as exc:
             self._record("comm_log", "Failed to fetch Jules activities", {"error": str(exc)})
             return
-        for activity in activities:
-            content = activity.get("content", "")
-            if not content:
-                continue
-            self.comm_log.append(
-                source="jules",
-                role=activity.get("role", "agent"),
-                content=content,
-                read=False,
-                external_id=activity.get("id"),
-                timestamp=activity.get("timestamp"),
-                session_id=self.shared_state.session_id,
-            )
+        try:
+            for activity in activities:
+                content = activity.get("content", "")
+                if not content:
+                    continue
+                self.comm_log.append(
+                    source="jules",
+                    role=activity.get("role", "agent"),
+                    content=content,
+                    read=False,
+                    external_id=activity.get("id"),
+                    timestamp=activity.get("timestamp"),
+                    session_id=self.shared_state.session_id,
+                    flush=False,
+                )
+        finally:
+            self.comm_log.flush()
 
     def _build_comm_channel(self) -> None:
         history_text = "" if self.shared_state.no_jules_sessions else self.comm_log.history_text(
@@ -154,7 +292,13 @@ class AgentLoop:
         if self.shared_state.no_jules_sessions:
             summary = "No Jules coding sessions have been done on this project yet."
         elif history_text and self.shared_state.llm_ready:
-            summary = self.compression.summarize_comm_history(history_text, target_tokens=1000)
+            history_hash = hash(history_text)
+            if history_hash == self._last_comm_hash:
+                summary = self._last_comm_summary
+            else:
+                summary = self.compression.summarize_comm_history(history_text, target_tokens=1000)
+                self._last_comm_hash = history_hash
+                self._last_comm_summary = summary
         elif history_text:
             summary = "Summary pending; LLM not ready."
         recent_messages = [] if self.shared_state.no_jules_sessions else self.comm_log.recent_user_messages(3)
@@ -164,13 +308,9 @@ class AgentLoop:
             recent_lines.append(f"- ({status}) {msg.timestamp} {msg.content}")
         jules_messages = []
         if not self.shared_state.no_jules_sessions:
-            jules_messages = [
-                msg
-                for msg in self.comm_log.list_messages()
-                if msg.source == "jules" and msg.session_id == self.shared_state.session_id
-            ]
+            jules_messages = self.comm_log.recent_jules_messages(self.shared_state.session_id)
         jules_lines = []
-        for msg in jules_messages[-3:]:
+        for msg in jules_messages:
             jules_lines.append(f"- {msg.timestamp} {msg.content}")
         if not jules_lines:
             jules_lines.append("No Jules messages for this source yet.")
@@ -191,6 +331,12 @@ class AgentLoop:
             {"length": len(self.shared_state.comm_channel)},
         )
 
+    @staticmethod
+    def _fits_inline(current: str, events_text: str) -> bool:
+        if not events_text:
+            return True
+        return estimate_tokens(current) + estimate_tokens(events_text) < COMPRESS_TOKEN_THRESHOLD
+
     def _update_goals_and_rolling(self, events: list[str]) -> None:
         events_text = "\n".join(f"- {line}" for line in events if line)
         if self.shared_state.llm_ready:
@@ -204,16 +350,30 @@ class AgentLoop:
                     "This is the first cycle; there is no rolling context yet. "
                     "Create an initial rolling context based on events."
                 )
-            self.shared_state.goals_plans = self.compression.update_goals_plans(
-                self.shared_state.goals_plans,
-                events_text,
-                target_tokens=1000,
-            )
-            self.shared_state.rolling_context = self.compression.update_rolling_context(
-                self.shared_state.rolling_context,
-                events_text,
-                target_tokens=1200,
-            )
+            if hash((events_text, self.shared_state.goals_plans)) != self._last_goals_input_hash:
+                if self._goals_seeded and self._fits_inline(self.shared_state.goals_plans, events_text):
+                    if events_text:
+                        self.shared_state.goals_plans += "\n" + events_text
+                else:
+                    self.shared_state.goals_plans = self.compression.update_goals_plans(
+                        self.shared_state.goals_plans,
+                        events_text,
+                        target_tokens=1000,
+                    )
+                    self._goals_seeded = True
+                self._last_goals_input_hash = hash((events_text, self.shared_state.goals_plans))
+            if hash((events_text, self.shared_state.rolling_context)) != self._last_rolling_input_hash:
+                if self._rolling_seeded and self._fits_inline(self.shared_state.rolling_context, events_text):
+                    if events_text:
+                        self.shared_state.rolling_context += "\n" + events_text
+                else:
+                    self.shared_state.rolling_context = self.compression.update_rolling_context(
+                        self.shared_state.rolling_context,
+                        events_text,
+                        target_tokens=1200,
+                    )
+                    self._rolling_seeded = True
+                self._last_rolling_input_hash = hash((events_text, self.shared_state.rolling_context))
         else:
             if not self.shared_state.goals_plans:
                 self.shared_state.goals_plans = "Goals and plans pending; LLM not ready."
@@ -235,10 +395,13 @@ class AgentLoop:
         if not unread:
             self.shared_state.last_unread_response = ""
             return
-        if not self.shared_state.llm_ready:
+        if len(unread) <= _QUICK_ACK_MAX_MESSAGES and sum(len(msg.content) for msg in unread) < _QUICK_ACK_MAX_CHARS:
+            response = "Acknowledged: " + "; ".join(msg.content for msg in unread)
+        elif not self.shared_state.llm_ready:
             return
-        message_text = "\n".join(f"- {msg.content}" for msg in unread)
-        response = self.compression.format_unread_response(message_text, target_tokens=300)
+        else:
+            message_text = "\n".join(f"- {msg.content}" for msg in unread)
+            response = self.compression.format_unread_response(message_text, target_tokens=300)
         self.shared_state.last_unread_response = response
         if self.shared_state.session_id:
             try:
@@ -248,6 +411,7 @@ class AgentLoop:
                     session_id=self.shared_state.session_id,
                 )
                 self.comm_log.mark_read([msg.message_id for msg in unread])
+                self._record("messages_updated", "Unread messages answered", {"count": len(unread)})
             except Exception as exc:
                 self._record("comm_log", "Failed to send unread response", {"error": str(exc)})
 
@@ -256,7 +420,7 @@ class AgentLoop:
         mess_out_jules: dict = {"action": "none", "payload": {}}
         mess_out_log = ""
         try:
-            payload = json.loads(raw)
+            payload = fastjson.loads(raw)
             mess_out_user = str(payload.get("mess_out_USER", "")).strip()
             mess_out_log = str(payload.get("mess_out_LOG", "")).strip()
             mess_out_jules_raw = payload.get("mess_out_JULES", {})
@@ -266,7 +430,7 @@ class AgentLoop:
                 if not isinstance(payload_obj, dict):
                     payload_obj = {}
                 mess_out_jules = {"action": action, "payload": payload_obj}
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             mess_out_log = "Agent turn output failed to parse; stored raw output."
         if not mess_out_log:
             mess_out_log = "Agent turn completed."
@@ -287,7 +451,14 @@ class AgentLoop:
             "goals_plans": self.shared_state.goals_plans,
             "rolling_context": self.shared_state.rolling_context,
         }
+        digest = hashlib.blake2b(fastjson.dumps(turn_inputs), digest_size=16)
+        digest.update(unread_text.encode("utf-8"))
+        turn_key = digest.digest()
+        if turn_key == self._last_turn_key and self.shared_state.last_agent_output is not None:
+            self._record("agent_turn_skipped", "Agent turn inputs unchanged")
+            return
         raw = self.compression.agent_turn_output(turn_inputs, unread_text)
+        self._last_turn_key = turn_key
         parsed = self._parse_agent_turn_output(raw)
         self.shared_state.last_agent_output = parsed
         self._record(
@@ -334,18 +505,18 @@ class AgentLoop:
             ]
         )
         try:
-            data = json.loads(response)
+            data = fastjson.loads(response)
             decision = ReviewDecision(data.get("decision", "reject"))
             rationale = str(data.get("rationale", "")).strip()
             return ReviewResult(decision=decision, rationale=rationale, raw=response)
-        except (json.JSONDecodeError, ValueError):
+        except (fastjson.JSONDecodeError, ValueError):
             return ReviewResult(decision=ReviewDecision.REJECT, rationale="Invalid review format", raw=response)
 
     def initialize(self) -> None:
         docs_text = self._load_docs()
         self._record("init_docs", "Compressing docs", {"bytes": len(docs_text)})
-        self.state.docs_summary = self.compression.compress(
-            docs_text,
+        self.state.docs_summary = self._compress_cached(
+            [docs_text],
             target_total_tokens=self.config.compression.target_total_tokens,
         )
         self.initialized = True
@@ -360,11 +531,11 @@ class AgentLoop:
             return
         self._sync_jules_messages()
         self._record("loop", "Pulling main")
-        self.repo.pull_main()
-        events.append("Pulled main branch.")
+        if self.repo.pull_main():
+            events.append("Pulled main branch.")
         codebase_texts = self.repo.read_text_files()
         self._record("loop", "Compressing codebase", {"files": len(codebase_texts)})
-        self.state.codebase_summary = self.compression.compress_many(
+        self.state.codebase_summary = self._compress_cached(
             codebase_texts,
             target_total_tokens=self.config.compression.target_total_tokens,
         )
@@ -404,15 +575,30 @@ class AgentLoop:
             self._run_agent_turn()
             return
         if status == JulesStatus.READY_FOR_REVIEW:
-            self._build_comm_channel()
-            self._update_goals_and_rolling(external_events)
-            pr_info = self.jules.get_pr_info(self.shared_state.session_id)
-            self.repo.fetch_branch(pr_info.branch)
-            pr_diff = self.repo.diff_main_to_branch(pr_info.branch)
-            compressed_diff = self.compression.compress(
-                pr_diff,
-                target_total_tokens=self.config.compression.max_input_tokens,
-            )
+            def update_contexts() -> None:
+                self._build_comm_channel()
+                self._update_goals_and_rolling(external_events)
+
+            # Start the context update first so a failing PR fetch cannot skip it.
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                contexts_future = executor.submit(update_contexts)
+                try:
+                    pr_info = self.jules.get_pr_info(self.shared_state.session_id)
+                    self.repo.fetch_branch(pr_info.branch)
+                    pr_diff = self.repo.diff_main_to_branch_ranked(
+                        pr_info.branch,
+                        max_chars=self.config.compression.max_input_tokens * 4,
+                    )
+                    compressed_diff = self.compression.compress(
+                        pr_diff,
+                        target_total_tokens=self.config.compression.max_input_tokens,
+                    )
+                finally:
+                    # Log rather than raise here so a context failure never masks a PR fetch/compress error.
+                    try:
+                        contexts_future.result()
+                    except Exception as exc:
+                        self._record("error", "Context update failed", {"error": str(exc)})
             review = self._review_pr(compressed_diff, f"{pr_info.title}\n{pr_info.description}")
             self._record(
                 "review_result",
@@ -465,5 +651,6 @@ class AgentLoop:
             except Exception as exc:
                 self._record("error", "Loop error", {"error": str(exc)})
                 print(f"[error] Loop error: {exc}", file=sys.stderr)
+            self.repo.start_fetch_main()
             iterations += 1
             time.sleep(self.config.loop.poll_interval_seconds)
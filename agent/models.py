@@ -1,10 +1,25 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from enum import Enum
+import sys
+import time
 from typing import Any, Callable
 
+_TZ_BY_OFFSET: dict[int, timezone] = {}
+
+
+def _local_timestamp() -> str:
+    # Key the tzinfo on the current UTC offset so it stays correct across DST changes.
+    now = time.time()
+    offset = time.localtime(now).tm_gmtoff
+    tz = _TZ_BY_OFFSET.get(offset)
+    if tz is None:
+        tz = _TZ_BY_OFFSET[offset] = timezone(timedelta(seconds=offset))
+    return datetime.fromtimestamp(now, tz).isoformat()
+
 
 class JulesStatus(str, Enum):
     IN_PROCESS = "inProcess"
@@ -18,15 +33,19 @@ class ReviewDecision(str, Enum):
     REJECT = "reject"
 
 
-@dataclass
+@dataclass(slots=True)
 class TraceEvent:
     kind: str
     message: str
     payload: dict[str, Any] | None = None
     timestamp: str | None = None
+    encoded: bytes | None = field(default=None, init=False, repr=False, compare=False)
 
+    def __post_init__(self) -> None:
+        self.kind = sys.intern(self.kind)
 
-@dataclass
+
+@dataclass(slots=True)
 class ProjectState:
     docs_summary: str = ""
     codebase_summary: str = ""
@@ -35,7 +54,7 @@ class ProjectState:
     requirements_met: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class CommMessage:
     message_id: str
     source: str
@@ -47,19 +66,19 @@ class CommMessage:
     session_id: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class LoopDecision:
     status: JulesStatus
     action: str
 
 
-@dataclass
+@dataclass(slots=True)
 class JulesRequest:
     request_id: str
     content: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PrInfo:
     pr_id: str
     branch: str
@@ -68,7 +87,7 @@ class PrInfo:
     description: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ReviewResult:
     decision: ReviewDecision
     rationale: str
@@ -78,23 +97,33 @@ class ReviewResult:
 @dataclass
 class TraceBuffer:
     max_events: int = 500
-    events: list[TraceEvent] = field(default_factory=list)
+    events: deque[TraceEvent] = field(init=False, repr=False)
     hook: Callable[[TraceEvent], None] | None = None
 
+    def __post_init__(self) -> None:
+        self.events = deque(maxlen=self.max_events)
+
     def add(self, event: TraceEvent) -> None:
         if event.timestamp is None:
-            event.timestamp = datetime.now().astimezone().isoformat()
+            event.timestamp = _local_timestamp()
         self.events.append(event)
-        if len(self.events) > self.max_events:
-            self.events = self.events[-self.max_events :]
         if self.hook:
             self.hook(event)
 
     def snapshot(self) -> list[TraceEvent]:
         return list(self.events)
 
+    def snapshot_columns(self) -> dict[str, list]:
+        events = list(self.events)
+        return {
+            "kind": [event.kind for event in events],
+            "message": [event.message for event in events],
+            "payload": [event.payload for event in events],
+            "timestamp": [event.timestamp for event in events],
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class AgentTurnOutput:
     mess_out_user: str
     mess_out_jules: dict
@@ -1,59 +1,257 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import subprocess
+import threading
+from typing import Callable
 
 from .config import RepoConfig, CompressionConfig
 
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
 
 class RepoManager:
     def __init__(self, config: RepoConfig, compression: CompressionConfig) -> None:
         self.config = config
         self.compression = compression
+        self._repo = self._open_repo()
+        # Serializes git subprocesses and pygit2 access so the background fetch never races ref locks.
+        self._git_lock = threading.RLock()
+        self._fetch_thread: threading.Thread | None = None
+        self._fetch_ok = False
+
+    def _open_repo(self):
+        if pygit2 is None:
+            return None
+        try:
+            discovered = pygit2.discover_repository(self.config.repo_path)
+            if not discovered:
+                return None
+            repo = pygit2.Repository(discovered)
+        except (pygit2.GitError, KeyError):
+            return None
+        if not repo.workdir or os.path.normcase(os.path.abspath(repo.workdir)) != os.path.normcase(
+            os.path.abspath(self.config.repo_path)
+        ):
+            return None
+        return repo
 
     def _run(self, args: list[str]) -> str:
-        result = subprocess.run(
-            args,
-            cwd=self.config.repo_path,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
+        with self._git_lock:
+            result = subprocess.run(
+                args,
+                cwd=self.config.repo_path,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
         return result.stdout.strip()
 
-    def pull_main(self) -> None:
-        self._run(["git", "checkout", self.config.main_branch])
-        self._run(["git", "pull", "origin", self.config.main_branch])
+    def _run_bytes(self, args: list[str]) -> bytes:
+        with self._git_lock:
+            result = subprocess.run(
+                args,
+                cwd=self.config.repo_path,
+                capture_output=True,
+                check=True,
+            )
+        return result.stdout
+
+    def _fetch_main(self) -> None:
+        try:
+            self._run(["git", "fetch", "origin", self.config.main_branch])
+            self._fetch_ok = True
+        except (OSError, subprocess.CalledProcessError):
+            self._fetch_ok = False
+
+    def start_fetch_main(self) -> None:
+        if self._fetch_thread is not None:
+            return
+        self._fetch_ok = False
+        self._fetch_thread = threading.Thread(target=self._fetch_main, daemon=True)
+        self._fetch_thread.start()
+
+    def pull_main(self) -> bool:
+        if self._fetch_thread is not None and self._fetch_thread.is_alive():
+            return False
+        fetched = self._fetch_thread is not None and self._fetch_ok
+        self._fetch_thread = None
+        with self._git_lock:
+            if not fetched:
+                self._run(["git", "fetch", "origin", self.config.main_branch])
+            self._run(["git", "checkout", self.config.main_branch])
+            upstream = f"origin/{self.config.main_branch}"
+            result = subprocess.run(
+                ["git", "merge-base", "--is-ancestor", upstream, "HEAD"],
+                cwd=self.config.repo_path,
+                capture_output=True,
+            )
+            if result.returncode == 0:
+                return False
+            self._run(["git", "merge", upstream])
+            return True
 
     def fetch_branch(self, branch: str) -> None:
         self._run(["git", "fetch", "origin", branch])
 
     def merge_branch(self, branch: str) -> None:
-        self._run(["git", "checkout", self.config.main_branch])
-        self._run(["git", "merge", f"origin/{branch}"])
+        with self._git_lock:
+            self._run(["git", "checkout", self.config.main_branch])
+            self._run(["git", "merge", f"origin/{branch}"])
 
-    def diff_main_to_branch(self, branch: str) -> str:
-        return self._run(["git", "diff", f"{self.config.main_branch}..origin/{branch}"])
+    def diff_main_to_branch_numstat(self, branch: str) -> list[tuple[int, int, str, str]]:
+        output = self._run_bytes(
+            ["git", "diff", "--numstat", "-z", "-M", f"{self.config.main_branch}..origin/{branch}"]
+        )
+        stats: list[tuple[int, int, str, str]] = []
+        records = iter(output.split(b"\x00"))
+        for record in records:
+            if not record:
+                continue
+            added, _, rest = record.partition(b"\t")
+            deleted, _, path = rest.partition(b"\t")
+            old_path = path
+            if not path:
+                old_path = next(records, b"")
+                path = next(records, b"")
+            if not added.isdigit() or not deleted.isdigit():
+                continue
+            stats.append((int(added), int(deleted), os.fsdecode(path), os.fsdecode(old_path)))
+        return stats
 
-    def list_tracked_files(self) -> list[str]:
-        output = self._run(["git", "ls-files"])
-        files = [line.strip() for line in output.splitlines() if line.strip()]
-        return [os.path.join(self.config.repo_path, path) for path in files]
+    def diff_main_to_branch_ranked(self, branch: str, max_chars: int) -> str:
+        if self._repo is not None:
+            try:
+                with self._git_lock:
+                    base = self._repo.revparse_single(self.config.main_branch).peel(pygit2.Commit)
+                    head = self._repo.revparse_single(f"origin/{branch}").peel(pygit2.Commit)
+                    stats = []
+                    texts: dict[str, str] = {}
+                    diff = self._repo.diff(base, head)
+                    diff.find_similar()
+                    for patch in diff:
+                        if patch.delta.is_binary:
+                            continue
+                        _, added, deleted = patch.line_stats
+                        path = patch.delta.new_file.path
+                        stats.append((added, deleted, path))
+                        texts[path] = patch.text or ""
+                return self._join_ranked_diffs(stats, texts.__getitem__, max_chars)
+            except (KeyError, pygit2.GitError):
+                pass
+        stats = self.diff_main_to_branch_numstat(branch)
+        if not stats:
+            return ""
+        pathspec: list[str] = []
+        for _, _, path, old_path in stats:
+            if old_path != path:
+                pathspec.append(old_path)
+            pathspec.append(path)
+        output = self._run(["git", "diff", "-M", f"{self.config.main_branch}..origin/{branch}", "--", *pathspec])
+        first, *rest = output.split("\ndiff --git ")
+        chunks = [first] + ["diff --git " + chunk for chunk in rest]
+        if len(chunks) != len(stats):
+            # File headers did not line up with numstat; fall back to one diff per file.
+            chunks = [
+                self._run(["git", "diff", "-M", f"{self.config.main_branch}..origin/{branch}", "--", old_path, path])
+                for _, _, path, old_path in stats
+            ]
+        texts = {path: chunk for (_, _, path, _), chunk in zip(stats, chunks)}
+        return self._join_ranked_diffs([stat[:3] for stat in stats], texts.__getitem__, max_chars)
 
-    def read_text_files(self) -> list[str]:
-        contents = []
-        for path in self.list_tracked_files():
-            if not os.path.isfile(path):
+    @staticmethod
+    def _join_ranked_diffs(
+        stats: list[tuple[int, int, str]],
+        load: Callable[[str], str],
+        max_chars: int,
+    ) -> str:
+        parts: list[str] = []
+        omitted: list[str] = []
+        remaining = max_chars
+        for _, _, path in sorted(stats, key=lambda item: item[0] + item[1], reverse=True):
+            text = load(path).strip()
+            if not text:
                 continue
-            if os.path.getsize(path) > self.compression.max_file_bytes:
+            # Skip anything that would overflow the budget and keep filling with smaller files.
+            if len(text) + 1 > remaining:
+                omitted.append(path)
                 continue
-            with open(path, "rb") as handle:
-                sample = handle.read(4096)
-                if b"\x00" in sample:
-                    continue
+            parts.append(text)
+            remaining -= len(text) + 1
+        if omitted:
+            parts.append(f"Omitted {len(omitted)} changed files over the diff budget: " + ", ".join(omitted))
+        return "\n".join(parts)
+
+    def list_tracked_files(self) -> list[str]:
+        if self._repo is not None:
+            with self._git_lock:
+                index = self._repo.index
+                index.read()
+                return [os.path.join(self.config.repo_path, entry.path) for entry in index]
+        output = self._run_bytes(["git", "ls-files", "-z"])
+        return [os.path.join(self.config.repo_path, os.fsdecode(path)) for path in output.split(b"\x00") if path]
+
+    def tracked_file_sizes(self) -> dict[str, int]:
+        if self._repo is not None:
             try:
-                with open(path, "r", encoding="utf-8") as handle:
-                    contents.append(f"File: {os.path.relpath(path, self.config.repo_path)}\n{handle.read()}")
-            except UnicodeDecodeError:
+                return self._tracked_file_sizes_pygit2()
+            except (KeyError, pygit2.GitError):
+                pass
+        try:
+            output = self._run_bytes(["git", "ls-tree", "-r", "-z", "--long", "HEAD"])
+        except (OSError, subprocess.CalledProcessError):
+            return {}
+        sizes: dict[str, int] = {}
+        for record in output.split(b"\x00"):
+            meta, sep, path = record.partition(b"\t")
+            if not sep:
                 continue
-        return contents
+            size = meta.split()[-1]
+            if size.isdigit():
+                sizes[os.path.join(self.config.repo_path, os.fsdecode(path))] = int(size)
+        return sizes
+
+    def _tracked_file_sizes_pygit2(self) -> dict[str, int]:
+        sizes: dict[str, int] = {}
+        with self._git_lock:
+            odb = self._repo.odb
+            pending = [("", self._repo.revparse_single("HEAD").peel(pygit2.Tree))]
+            while pending:
+                prefix, tree = pending.pop()
+                for entry in tree:
+                    path = prefix + entry.name
+                    if entry.type_str == "tree":
+                        pending.append((path + "/", self._repo[entry.id]))
+                    elif entry.type_str == "blob":
+                        # read_header returns (type, size) without inflating the blob.
+                        sizes[os.path.join(self.config.repo_path, path)] = odb.read_header(entry.id)[1]
+        return sizes
+
+    def _read_text_file(self, path: str) -> str | None:
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read(self.compression.max_file_bytes + 1)
+        except OSError:
+            return None
+        if len(data) > self.compression.max_file_bytes or b"\x00" in data[:4096]:
+            return None
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        return "".join(("File: ", os.path.relpath(path, self.config.repo_path), "\n", text))
+
+    def read_text_files(self) -> list[str]:
+        sizes = self.tracked_file_sizes()
+        limit = self.compression.max_file_bytes
+        paths = [path for path in self.list_tracked_files() if sizes.get(path, 0) <= limit]
+        if not paths:
+            return []
+        workers = min(32, (os.cpu_count() or 1) * 4, len(paths))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(self._read_text_file, paths)
+            return [text for text in results if text is not None]
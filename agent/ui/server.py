@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-import json
+from collections import deque
+import gzip
+import hashlib
 import os
 import queue
 import threading
+import time
 from typing import Callable
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from socketserver import ThreadingMixIn
 
+from .. import fastjson
 from ..comm_log import CommLog
 from ..loop import SharedState
 from ..models import TraceEvent, TraceBuffer
@@ -105,61 +109,91 @@ HTML_PAGE = """<!doctype html>
     window.addEventListener('error', (event) => {
       document.getElementById('startStatus').textContent = `UI error: ${event.message}`;
     });
-    evtSource.onmessage = function(event) {
-      try {
-        const data = JSON.parse(event.data);
-        const stamp = data.timestamp ? `${data.timestamp} ` : '';
-        const line = `${stamp}[${data.kind}] ${data.message}`;
+    const maxEventRows = 500;
+    const pendingEventLines = [];
+    let eventsFlushScheduled = false;
+    function flushEventLines() {
+      eventsFlushScheduled = false;
+      const frag = document.createDocumentFragment();
+      for (const line of pendingEventLines) {
         const div = document.createElement('div');
         div.textContent = line;
-        eventsBox.appendChild(div);
-        eventsBox.scrollTop = eventsBox.scrollHeight;
-        if (data.kind === 'llm_request') {
-          llmStreamBox.textContent = '';
-          if (data.payload && data.payload.body && Array.isArray(data.payload.body.messages)) {
-            const parts = [];
-            let total = 0;
-            const maxTotal = 12000;
-            for (const msg of data.payload.body.messages) {
-              const role = msg.role || 'unknown';
-              let content = msg.content || '';
-              if (content.length > 4000) {
-                content = `${content.slice(0, 4000)}\n...[truncated]`;
-              }
-              const block = `[${role}]\n${content}`;
-              total += block.length;
-              if (total > maxTotal) {
-                parts.push('...[prompt truncated]');
-                break;
-              }
-              parts.push(block);
-            }
-            llmPromptBox.textContent = parts.join('\\n\\n');
-          }
+        frag.appendChild(div);
+      }
+      pendingEventLines.length = 0;
+      eventsBox.appendChild(frag);
+      while (eventsBox.childElementCount > maxEventRows) {
+        eventsBox.removeChild(eventsBox.firstChild);
+      }
+      eventsBox.scrollTop = eventsBox.scrollHeight;
+    }
+    function handleTraceEvent(data) {
+      const stamp = data.timestamp ? `${data.timestamp} ` : '';
+      pendingEventLines.push(`${stamp}[${data.kind}] ${data.message}`);
+      if (pendingEventLines.length > maxEventRows) {
+        pendingEventLines.shift();
+      }
+      if (!eventsFlushScheduled) {
+        eventsFlushScheduled = true;
+        requestAnimationFrame(flushEventLines);
+      }
+      if (data.kind === 'llm_request') {
+        llmStreamBox.textContent = '';
+        if (data.payload && typeof data.payload.body_preview === 'string') {
+          llmPromptBox.textContent = data.payload.body_preview;
         }
-        if (data.kind === 'llm_stream' && data.payload && data.payload.delta) {
-          llmStreamBox.textContent += data.payload.delta;
-          llmStreamBox.scrollTop = llmStreamBox.scrollHeight;
+      }
+      if (data.kind === 'llm_stream_batch' && data.payload && Array.isArray(data.payload.deltas)) {
+        llmStreamBox.textContent += data.payload.deltas.join('');
+        llmStreamBox.scrollTop = llmStreamBox.scrollHeight;
+      }
+      if (data.kind === 'status' && data.payload) {
+        applyStatus(data.payload);
+      } else if (data.kind === 'messages_updated') {
+        loadRecentMessages();
+      } else if (data.kind.startsWith('context_')) {
+        scheduleContextRefresh();
+      }
+    }
+    let contextRefreshTimer = null;
+    function scheduleContextRefresh() {
+      if (contextRefreshTimer) return;
+      contextRefreshTimer = setTimeout(() => {
+        contextRefreshTimer = null;
+        refreshContext();
+      }, 250);
+    }
+    evtSource.onmessage = function(event) {
+      try {
+        const parsed = JSON.parse(event.data);
+        for (const data of Array.isArray(parsed) ? parsed : [parsed]) {
+          handleTraceEvent(data);
         }
       } catch (err) {
         document.getElementById('startStatus').textContent = 'UI stream error (see console).';
       }
     };
+    const lastPaneText = new Map();
+    function setPaneText(box, value) {
+      if (lastPaneText.get(box) === value) return;
+      lastPaneText.set(box, value);
+      box.textContent = value;
+    }
     async function refreshContext() {
       const response = await fetch('/context');
       const payload = await response.json();
-      commChannelBox.textContent = payload.comm_channel || '';
-      goalsPlansBox.textContent = payload.goals_plans || '';
-      rollingContextBox.textContent = payload.rolling_context || '';
-      agentOutputBox.textContent = payload.agent_output_json || '';
+      setPaneText(commChannelBox, payload.comm_channel || '');
+      setPaneText(goalsPlansBox, payload.goals_plans || '');
+      setPaneText(rollingContextBox, payload.rolling_context || '');
+      setPaneText(agentOutputBox, payload.agent_output_json || '');
     }
     async function sendInterrupt(message) {
       const payload = message || document.getElementById('interrupt').value;
       if (!payload) return;
       await fetch('/interrupt', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: payload })
+        headers: { 'Content-Type': 'text/plain; charset=utf-8' },
+        body: payload
       });
       document.getElementById('interrupt').value = '';
       await refreshContext();
@@ -177,8 +211,8 @@ HTML_PAGE = """<!doctype html>
       const content = document.getElementById('env').value || '';
       await fetch('/env', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ content })
+        headers: { 'Content-Type': 'text/plain; charset=utf-8' },
+        body: content
       });
     }
     async function dumpState() {
@@ -200,8 +234,8 @@ HTML_PAGE = """<!doctype html>
       const content = document.getElementById('systemMessage').value || '';
       await fetch('/system', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ content })
+        headers: { 'Content-Type': 'text/plain; charset=utf-8' },
+        body: content
       });
       await loadSystemMessage();
     }
@@ -215,7 +249,7 @@ HTML_PAGE = """<!doctype html>
         return;
       }
       const select = document.getElementById('sources');
-      select.innerHTML = '';
+      const previous = select.value;
       const sources = payload.sources || [];
       const error = payload.error || '';
       if (response.ok) {
@@ -227,19 +261,28 @@ HTML_PAGE = """<!doctype html>
         const opt = document.createElement('option');
         opt.value = '';
         opt.textContent = error ? `No sources` : 'No sources available';
-        select.appendChild(opt);
+        select.replaceChildren(opt);
         return;
       }
+      const frag = document.createDocumentFragment();
       for (const source of sources) {
         const opt = document.createElement('option');
         opt.value = source.name || source.id || '';
         opt.textContent = source.name || source.id || '';
-        select.appendChild(opt);
+        frag.appendChild(opt);
+      }
+      select.replaceChildren(frag);
+      if (previous) {
+        select.value = previous;
       }
     }
+    let lastStatus = {};
     async function refreshStatus() {
       const response = await fetch('/status');
-      const payload = await response.json();
+      applyStatus(await response.json());
+    }
+    async function applyStatus(payload) {
+      lastStatus = payload;
       const select = document.getElementById('sources');
       const startButton = document.getElementById('startButton');
       const sourceSelected = Boolean(select.value);
@@ -263,8 +306,8 @@ HTML_PAGE = """<!doctype html>
       }
       const response = await fetch('/start', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ source })
+        headers: { 'Content-Type': 'text/plain; charset=utf-8' },
+        body: source
       });
       const payload = await response.json();
       document.getElementById('startStatus').textContent = payload.message || '';
@@ -273,12 +316,12 @@ HTML_PAGE = """<!doctype html>
       const response = await fetch('/messages/recent');
       const payload = await response.json();
       const container = document.getElementById('recentMessages');
-      container.innerHTML = '';
       const messages = payload.messages || [];
       if (!messages.length) {
         container.textContent = 'No recent user messages.';
         return;
       }
+      const frag = document.createDocumentFragment();
       for (const msg of messages) {
         const row = document.createElement('div');
         const status = msg.read ? 'read' : 'unread';
@@ -296,8 +339,9 @@ HTML_PAGE = """<!doctype html>
           };
           row.appendChild(button);
         }
-        container.appendChild(row);
+        frag.appendChild(row);
       }
+      container.replaceChildren(frag);
     }
     async function purgeUserMessages() {
       const response = await fetch('/messages/purge_user', { method: 'POST' });
@@ -308,45 +352,130 @@ HTML_PAGE = """<!doctype html>
     loadEnv();
     loadSystemMessage();
     loadSources().then(refreshStatus);
-    document.getElementById('sources').addEventListener('change', refreshStatus);
+    document.getElementById('sources').addEventListener('change', () => applyStatus(lastStatus));
     refreshContext();
     loadRecentMessages();
-    setInterval(refreshStatus, 2000);
-    setInterval(refreshContext, 5000);
-    setInterval(loadRecentMessages, 5000);
-    setInterval(loadSources, 15000);
+    setInterval(() => {
+      refreshStatus();
+      refreshContext();
+      loadRecentMessages();
+      loadSources();
+    }, 30000);
   </script>
 </body>
 </html>
 """
+HTML_PAGE_BYTES = HTML_PAGE.encode("utf-8")
+HTML_PAGE_LEN = str(len(HTML_PAGE_BYTES))
+HTML_PAGE_GZ = gzip.compress(HTML_PAGE_BYTES, compresslevel=6)
+HTML_PAGE_GZ_LEN = str(len(HTML_PAGE_GZ))
+_SUBSCRIBER_QUEUE_SIZE = 1024
+_SSE_BATCH_WINDOW_SECONDS = 0.025
+_SSE_BATCH_MAX_EVENTS = 64
+_RESPONSE_TTL_SECONDS = 0.25
+_GZIP_MIN_BYTES = 1024
+_MAX_BODY_BYTES = 1 << 20
+
+
+def _encode_event(event: TraceEvent) -> bytes:
+    payload = event.payload
+    if payload and "body_preview" in payload:
+        payload = {key: value for key, value in payload.items() if key != "body"}
+    record = {
+        "kind": event.kind,
+        "message": event.message,
+        "payload": payload,
+        "timestamp": event.timestamp,
+    }
+    try:
+        return fastjson.dumps(record)
+    except (TypeError, ValueError):
+        record["payload"] = str(event.payload)
+        return fastjson.dumps(record)
+
+
+class _Subscriber:
+    __slots__ = ("events", "ready", "lock")
+
+    def __init__(self, max_events: int) -> None:
+        self.events: deque[TraceEvent] = deque(maxlen=max_events)
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+    def push(self, event: TraceEvent) -> None:
+        with self.lock:
+            self.events.append(event)
+        self.ready.set()
+
+    def drain(self, limit: int) -> list[TraceEvent]:
+        with self.lock:
+            batch = [self.events.popleft() for _ in range(min(limit, len(self.events)))]
+            if not self.events:
+                self.ready.clear()
+        return batch
 
 
 class TraceBroadcaster:
-    def __init__(self) -> None:
-        self._queues: list[queue.Queue[TraceEvent]] = []
+    def __init__(self, max_queue_size: int = _SUBSCRIBER_QUEUE_SIZE) -> None:
+        self._subscribers: tuple[_Subscriber, ...] = ()
         self._lock = threading.Lock()
+        self._max_queue_size = max_queue_size
 
-    def subscribe(self) -> queue.Queue[TraceEvent]:
-        q: queue.Queue[TraceEvent] = queue.Queue()
+    def subscribe(self) -> _Subscriber:
+        subscriber = _Subscriber(self._max_queue_size)
         with self._lock:
-            self._queues.append(q)
-        return q
+            self._subscribers = self._subscribers + (subscriber,)
+        return subscriber
 
-    def unsubscribe(self, q: queue.Queue[TraceEvent]) -> None:
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
         with self._lock:
-            if q in self._queues:
-                self._queues.remove(q)
+            self._subscribers = tuple(item for item in self._subscribers if item is not subscriber)
 
     def publish(self, event: TraceEvent) -> None:
-        with self._lock:
-            targets = list(self._queues)
-        for q in targets:
-            q.put(event)
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        if event.encoded is None:
+            event.encoded = _encode_event(event)
+        for subscriber in subscribers:
+            subscriber.push(event)
 
 
 class _ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
 
+    def __init__(self, server_address: tuple[str, int], handler_class: type, pool_size: int) -> None:
+        super().__init__(server_address, handler_class)
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._detached: set = set()
+        for index in range(max(1, pool_size)):
+            threading.Thread(target=self._serve_pending, name=f"ui-http-{index}", daemon=True).start()
+
+    def _serve_pending(self) -> None:
+        while True:
+            request, client_address = self._pending.get()
+            self.process_request_thread(request, client_address)
+
+    def process_request(self, request, client_address) -> None:
+        self._pending.put((request, client_address))
+
+    def detach(self, request, target: Callable[[], None]) -> None:
+        # Long-lived streams run on their own thread so they never pin a pool worker.
+        self._detached.add(request)
+        threading.Thread(target=self._run_detached, args=(request, target), name="ui-sse", daemon=True).start()
+
+    def _run_detached(self, request, target: Callable[[], None]) -> None:
+        try:
+            target()
+        finally:
+            self._detached.discard(request)
+            super().shutdown_request(request)
+
+    def shutdown_request(self, request) -> None:
+        if request in self._detached:
+            return
+        super().shutdown_request(request)
+
 
 class UiHandler(BaseHTTPRequestHandler):
     shared_state: SharedState
@@ -354,233 +483,328 @@ class UiHandler(BaseHTTPRequestHandler):
     broadcaster: TraceBroadcaster
     env_path: str
     system_message_path: str
+    fsync_writes: bool = False
     sources_fetcher: Callable[[], list[dict]] | None
     start_callback: Callable[[str], str | None] | None
     status_provider: Callable[[], dict] | None
     comm_log: CommLog
     dump_handler: Callable[[], str] | None
+    _response_cache: dict[str, tuple[float, bytes, str, bytes | None]] = {}
+    _response_lock = threading.Lock()
+    _env_cache: tuple[int, int, str] | None = None
 
     def _send_json(self, payload: dict, status: int = HTTPStatus.OK) -> None:
-        data = json.dumps(payload).encode("utf-8")
+        data = fastjson.dumps(payload)
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(data)))
         self.end_headers()
         self.wfile.write(data)
 
-    def do_GET(self) -> None:
-        if self.path == "/":
-            data = HTML_PAGE.encode("utf-8")
-            self.send_response(HTTPStatus.OK)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Content-Length", str(len(data)))
+    def _accepts_gzip(self) -> bool:
+        return "gzip" in self.headers.get("Accept-Encoding", "")
+
+    def _send_cached_json(self, key: str, build: Callable[[], dict]) -> None:
+        with self._response_lock:
+            cached = self._response_cache.get(key)
+            now = time.monotonic()
+            if cached is None or now - cached[0] > _RESPONSE_TTL_SECONDS:
+                data = fastjson.dumps(build())
+                etag = '"' + hashlib.blake2b(data, digest_size=8).hexdigest() + '"'
+                compressed = gzip.compress(data, compresslevel=6) if len(data) > _GZIP_MIN_BYTES else None
+                cached = (now, data, etag, compressed)
+                self._response_cache[key] = cached
+        _, data, etag, compressed = cached
+        encoding = None
+        if compressed is not None and self._accepts_gzip():
+            data = compressed
+            etag = etag[:-1] + '-gzip"'
+            encoding = "gzip"
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
             self.end_headers()
-            self.wfile.write(data)
             return
-        if self.path == "/context":
-            agent_json = ""
-            if self.shared_state.last_agent_output:
-                agent_json = json.dumps(
-                    {
-                        "mess_out_USER": self.shared_state.last_agent_output.mess_out_user,
-                        "mess_out_JULES": self.shared_state.last_agent_output.mess_out_jules,
-                        "mess_out_LOG": self.shared_state.last_agent_output.mess_out_log,
-                    },
-                    ensure_ascii=True,
-                )
-            self._send_json(
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json_body(self, length: int) -> tuple[dict | None, str]:
+        data = self.rfile.read(length) if length else b""
+        if not self.headers.get("Content-Type", "").startswith("application/json"):
+            return None, data.decode("utf-8", errors="replace")
+        try:
+            payload = fastjson.loads(data) if data else None
+        except fastjson.JSONDecodeError:
+            payload = None
+        if isinstance(payload, dict):
+            return payload, ""
+        return None, data.decode("utf-8", errors="replace")
+
+    def _write_file(self, path: str, content: str) -> None:
+        view = memoryview(content.encode("utf-8"))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o600)
+        try:
+            while view:
+                view = view[os.write(fd, view):]
+            if self.fsync_writes:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _publish(self, kind: str, message: str, payload: dict | None = None) -> None:
+        self.trace_buffer.add(TraceEvent(kind=kind, message=message, payload=payload))
+
+    def _read_env(self) -> str:
+        try:
+            stat = os.stat(self.env_path)
+        except OSError:
+            return ""
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = UiHandler._env_cache
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        try:
+            with open(self.env_path, "r", encoding="utf-8") as handle:
+                content = handle.read()
+        except OSError:
+            return ""
+        UiHandler._env_cache = (*key, content)
+        return content
+
+    def _context_payload(self) -> dict:
+        agent_json = ""
+        if self.shared_state.last_agent_output:
+            agent_json = fastjson.dumps(
                 {
-                    "comm_channel": self.shared_state.comm_channel,
-                    "goals_plans": self.shared_state.goals_plans,
-                    "rolling_context": self.shared_state.rolling_context,
-                    "agent_output_json": agent_json,
+                    "mess_out_USER": self.shared_state.last_agent_output.mess_out_user,
+                    "mess_out_JULES": self.shared_state.last_agent_output.mess_out_jules,
+                    "mess_out_LOG": self.shared_state.last_agent_output.mess_out_log,
                 }
-            )
-            return
-        if self.path == "/system":
-            self._send_json(
+            ).decode("utf-8")
+        return {
+            "comm_channel": self.shared_state.comm_channel,
+            "goals_plans": self.shared_state.goals_plans,
+            "rolling_context": self.shared_state.rolling_context,
+            "agent_output_json": agent_json,
+        }
+
+    def _get_page(self) -> None:
+        gzipped = self._accepts_gzip()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", HTML_PAGE_GZ_LEN if gzipped else HTML_PAGE_LEN)
+        self.send_header("Vary", "Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(HTML_PAGE_GZ if gzipped else HTML_PAGE_BYTES)
+
+    def _get_context(self) -> None:
+        self._send_cached_json("/context", self._context_payload)
+
+    def _get_system(self) -> None:
+        self._send_json(
+            {
+                "content": self.shared_state.system_message,
+                "locked": self.shared_state.system_message_locked,
+            }
+        )
+
+    def _get_env(self) -> None:
+        self._send_json({"content": self._read_env()})
+
+    def _get_sources(self) -> None:
+        try:
+            sources = self.sources_fetcher() if self.sources_fetcher else []
+            self._send_json({"sources": sources})
+        except Exception as exc:
+            self._send_json({"sources": [], "error": str(exc)}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def _get_status(self) -> None:
+        self._send_cached_json("/status", lambda: self.status_provider() if self.status_provider else {})
+
+    def _get_recent_messages(self) -> None:
+        messages = self.comm_log.recent_user_messages(3)
+        payload = {
+            "messages": [
                 {
-                    "content": self.shared_state.system_message,
-                    "locked": self.shared_state.system_message_locked,
+                    "message_id": msg.message_id,
+                    "content": msg.content,
+                    "timestamp": msg.timestamp,
+                    "read": msg.read,
+                    "source": msg.source,
                 }
-            )
-            return
-        if self.path == "/env":
-            content = ""
-            try:
-                if os.path.isfile(self.env_path):
-                    with open(self.env_path, "r", encoding="utf-8") as handle:
-                        content = handle.read()
-            except OSError:
-                content = ""
-            self._send_json({"content": content})
-            return
-        if self.path == "/sources":
-            try:
-                sources = self.sources_fetcher() if self.sources_fetcher else []
-                self._send_json({"sources": sources})
-            except Exception as exc:
-                self._send_json({"sources": [], "error": str(exc)}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
-            return
-        if self.path == "/status":
-            payload = self.status_provider() if self.status_provider else {}
-            self._send_json(payload)
-            return
-        if self.path == "/messages/recent":
-            messages = self.comm_log.recent_user_messages(3)
-            payload = {
-                "messages": [
-                    {
-                        "message_id": msg.message_id,
-                        "content": msg.content,
-                        "timestamp": msg.timestamp,
-                        "read": msg.read,
-                        "source": msg.source,
-                    }
-                    for msg in messages
-                ]
-            }
-            self._send_json(payload)
-            return
-        if self.path == "/events":
-            self.send_response(HTTPStatus.OK)
-            self.send_header("Content-Type", "text/event-stream")
-            self.send_header("Cache-Control", "no-cache")
-            self.send_header("Connection", "keep-alive")
-            self.end_headers()
-            q = self.broadcaster.subscribe()
-            try:
-                while True:
-                    try:
-                        event = q.get(timeout=10)
-                        payload = json.dumps(
-                            {
-                                "kind": event.kind,
-                                "message": event.message,
-                                "payload": event.payload,
-                                "timestamp": event.timestamp,
-                            }
-                        )
-                        self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
-                        self.wfile.flush()
-                    except queue.Empty:
-                        self.wfile.write(b": heartbeat\n\n")
-                        self.wfile.flush()
-            except ConnectionError:
-                pass
-            finally:
-                self.broadcaster.unsubscribe(q)
-            return
-        self.send_response(HTTPStatus.NOT_FOUND)
+                for msg in messages
+            ]
+        }
+        self._send_json(payload)
+
+    def _get_events(self) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
         self.end_headers()
+        self.close_connection = True
+        subscriber = self.broadcaster.subscribe()
+        self.server.detach(self.connection, lambda: self._stream_events(self.connection, subscriber))
 
-    def do_POST(self) -> None:
-        if self.path == "/interrupt":
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length else ""
-            message = ""
-            try:
-                payload = json.loads(body)
-                message = str(payload.get("message", "")).strip()
-            except json.JSONDecodeError:
-                message = body.strip()
-            if message:
-                self.shared_state.add_interrupt(message)
-                self.comm_log.append(source="local_ui", role="user", content=message, read=False)
-            self._send_json({"ok": True})
+    def _stream_events(self, connection, subscriber: _Subscriber) -> None:
+        try:
+            while True:
+                if not subscriber.ready.wait(10):
+                    connection.sendall(b": heartbeat\n\n")
+                    continue
+                if len(subscriber.events) < _SSE_BATCH_MAX_EVENTS:
+                    time.sleep(_SSE_BATCH_WINDOW_SECONDS)
+                events = subscriber.drain(_SSE_BATCH_MAX_EVENTS)
+                if events:
+                    payload = b",".join([event.encoded for event in events])
+                    connection.sendall(b"".join((b"data: [", payload, b"]\n\n")))
+        except OSError:
+            pass
+        finally:
+            self.broadcaster.unsubscribe(subscriber)
+
+    def do_GET(self) -> None:
+        handler = self._GET_ROUTES.get(self.path)
+        if handler is None:
+            self._send_not_found()
             return
-        if self.path == "/system":
-            if self.shared_state.system_message_locked:
-                self._send_json({"ok": False, "message": "System message is locked."}, status=HTTPStatus.FORBIDDEN)
-                return
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length else ""
-            content = ""
-            try:
-                payload = json.loads(body)
-                content = str(payload.get("content", "")).strip()
-            except json.JSONDecodeError:
-                content = body.strip()
-            if content:
-                self.shared_state.system_message = content
-                try:
-                    with open(self.system_message_path, "w", encoding="utf-8") as handle:
-                        handle.write(content)
-                except OSError:
-                    self._send_json({"ok": False}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
-                    return
-            self._send_json({"ok": True})
+        handler(self)
+
+    def _post_interrupt(self, length: int) -> None:
+        payload, body = self._read_json_body(length)
+        message = str(payload.get("message", "")).strip() if payload is not None else body.strip()
+        if message:
+            self.shared_state.add_interrupt(message)
+            self.comm_log.append(source="local_ui", role="user", content=message, read=False)
+            self._publish("messages_updated", "User message added")
+        self._send_json({"ok": True})
+
+    def _post_system(self, length: int) -> None:
+        if self.shared_state.system_message_locked:
+            self._send_json({"ok": False, "message": "System message is locked."}, status=HTTPStatus.FORBIDDEN)
             return
-        if self.path == "/env":
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length else ""
-            content = ""
-            try:
-                payload = json.loads(body)
-                content = str(payload.get("content", ""))
-            except json.JSONDecodeError:
-                content = body
+        payload, body = self._read_json_body(length)
+        content = str(payload.get("content", "")).strip() if payload is not None else body.strip()
+        if content:
+            self.shared_state.system_message = content
             try:
-                with open(self.env_path, "w", encoding="utf-8") as handle:
-                    handle.write(content)
+                self._write_file(self.system_message_path, content)
             except OSError:
                 self._send_json({"ok": False}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
                 return
-            self._send_json({"ok": True})
+        self._send_json({"ok": True})
+
+    def _post_env(self, length: int) -> None:
+        payload, body = self._read_json_body(length)
+        content = str(payload.get("content", "")) if payload is not None else body
+        try:
+            self._write_file(self.env_path, content)
+        except OSError:
+            self._send_json({"ok": False}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
             return
-        if self.path == "/messages/mark_read":
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length else ""
-            ids: list[str] = []
-            try:
-                payload = json.loads(body)
-                ids = [str(item) for item in payload.get("ids", [])]
-            except json.JSONDecodeError:
-                ids = []
-            if ids:
-                self.comm_log.mark_read(ids)
-            self._send_json({"ok": True})
+        finally:
+            # A same-size rewrite within the mtime granularity would otherwise keep serving old content.
+            UiHandler._env_cache = None
+        self._send_json({"ok": True})
+
+    def _post_mark_read(self, length: int) -> None:
+        payload, _ = self._read_json_body(length)
+        ids = [str(item) for item in payload.get("ids", [])] if payload is not None else []
+        if ids:
+            self.comm_log.mark_read(ids)
+            self._publish("messages_updated", "Messages marked read", {"count": len(ids)})
+        self._send_json({"ok": True})
+
+    def _post_purge_user(self, length: int) -> None:
+        removed = self.comm_log.purge_user_messages()
+        if removed:
+            self._publish("messages_updated", "User messages purged", {"count": removed})
+        self._send_json({"ok": True, "message": f"Purged {removed} user messages."})
+
+    def _post_dump(self, length: int) -> None:
+        if not self.dump_handler:
+            self._send_json({"ok": False, "message": "Dump not configured."}, status=HTTPStatus.SERVICE_UNAVAILABLE)
             return
-        if self.path == "/messages/purge_user":
-            removed = self.comm_log.purge_user_messages()
-            self._send_json({"ok": True, "message": f"Purged {removed} user messages."})
+        try:
+            filename = self.dump_handler()
+        except Exception as exc:
+            self._send_json({"ok": False, "message": f"Dump failed: {exc}"}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
             return
-        if self.path == "/dump":
-            if not self.dump_handler:
-                self._send_json({"ok": False, "message": "Dump not configured."}, status=HTTPStatus.SERVICE_UNAVAILABLE)
-                return
-            try:
-                filename = self.dump_handler()
-            except Exception as exc:
-                self._send_json({"ok": False, "message": f"Dump failed: {exc}"}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
-                return
-            self._send_json({"ok": True, "message": f"Dumped to {filename}"})
+        self._send_json({"ok": True, "message": f"Dumped to {filename}"})
+
+    def _post_start(self, length: int) -> None:
+        payload, body = self._read_json_body(length)
+        source = str(payload.get("source", "")).strip() if payload is not None else body.strip()
+        if not source:
+            self._send_json({"ok": False, "message": "Source is required."}, status=HTTPStatus.BAD_REQUEST)
             return
-        if self.path == "/start":
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length else ""
-            source = ""
-            try:
-                payload = json.loads(body)
-                source = str(payload.get("source", "")).strip()
-            except json.JSONDecodeError:
-                source = body.strip()
-            if not source:
-                self._send_json({"ok": False, "message": "Source is required."}, status=HTTPStatus.BAD_REQUEST)
-                return
-            if not self.start_callback:
-                self._send_json({"ok": False, "message": "Start not configured."}, status=HTTPStatus.SERVICE_UNAVAILABLE)
-                return
-            try:
-                message = self.start_callback(source)
-            except Exception as exc:
-                self._send_json({"ok": False, "message": f"Start failed: {exc}"}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
-                return
-            self._send_json({"ok": True, "message": message or "Started"})
+        if not self.start_callback:
+            self._send_json({"ok": False, "message": "Start not configured."}, status=HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+        try:
+            message = self.start_callback(source)
+        except Exception as exc:
+            self._send_json({"ok": False, "message": f"Start failed: {exc}"}, status=HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        if self.status_provider:
+            self._publish("status", "Status updated", self.status_provider())
+        self._send_json({"ok": True, "message": message or "Started"})
+
+    def do_POST(self) -> None:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json({"ok": False, "message": "Invalid Content-Length."}, status=HTTPStatus.BAD_REQUEST)
+            return
+        if length > _MAX_BODY_BYTES:
+            self._send_json(
+                {"ok": False, "message": "Request body too large."},
+                status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
             return
+        handler = self._POST_ROUTES.get(self.path)
+        if handler is None:
+            self._send_not_found()
+            return
+        handler(self, length)
+
+    def _send_not_found(self) -> None:
         self.send_response(HTTPStatus.NOT_FOUND)
         self.end_headers()
 
+    _GET_ROUTES: dict[str, Callable[[UiHandler], None]] = {
+        "/": _get_page,
+        "/context": _get_context,
+        "/system": _get_system,
+        "/env": _get_env,
+        "/sources": _get_sources,
+        "/status": _get_status,
+        "/messages/recent": _get_recent_messages,
+        "/events": _get_events,
+    }
+    _POST_ROUTES: dict[str, Callable[[UiHandler, int], None]] = {
+        "/interrupt": _post_interrupt,
+        "/system": _post_system,
+        "/env": _post_env,
+        "/messages/mark_read": _post_mark_read,
+        "/messages/purge_user": _post_purge_user,
+        "/dump": _post_dump,
+        "/start": _post_start,
+    }
+
 
 class UiServer:
     def __init__(
@@ -596,6 +820,8 @@ class UiServer:
         comm_log: CommLog | None = None,
         system_message_path: str | None = None,
         dump_handler: Callable[[], str] | None = None,
+        fsync_writes: bool = False,
+        http_threads: int = 16,
     ) -> None:
         self.host = host
         self.port = port
@@ -609,12 +835,13 @@ class UiServer:
         self.status_provider = status_provider
         self.comm_log = comm_log or CommLog(os.path.join(repo_path, ".lpm", "comm_log.jsonl"))
         self.dump_handler = dump_handler
-        self._server = _ThreadedHTTPServer((self.host, self.port), UiHandler)
+        self._server = _ThreadedHTTPServer((self.host, self.port), UiHandler, http_threads)
         UiHandler.shared_state = shared_state
         UiHandler.trace_buffer = trace
         UiHandler.broadcaster = self.broadcaster
         UiHandler.env_path = self.env_path
         UiHandler.system_message_path = self.system_message_path
+        UiHandler.fsync_writes = fsync_writes
         UiHandler.sources_fetcher = staticmethod(sources_fetcher) if sources_fetcher else None
         UiHandler.start_callback = staticmethod(start_callback) if start_callback else None
         UiHandler.status_provider = staticmethod(status_provider) if status_provider else None
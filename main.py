@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import http.client
 import os
-import json
+import queue
+import shlex
+import signal
 import subprocess
 import threading
 import time
-from datetime import datetime
-import requests
+from pathlib import Path
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
+from agent import fastjson
 from agent.comm_log import CommLog
 from agent.compress import CompressionPipeline
 from agent.config import AgentConfig
@@ -19,6 +23,35 @@ from agent.models import TraceBuffer, TraceEvent
 from agent.repo_manager import RepoManager
 from agent.ui.server import UiServer
 
+_SOURCES_TTL_SECONDS = 5.0
+_SHELL_METACHARACTERS = frozenset("|&;<>()$`~*?%^\n")
+_LLM_STOP_TIMEOUT_SECONDS = 5.0
+
+
+def _needs_shell(command: str) -> bool:
+    if not _SHELL_METACHARACTERS.isdisjoint(command):
+        return True
+    # A leading VAR=value assignment only means something to a shell.
+    first = command.split(None, 1)[0] if command.strip() else ""
+    return "=" in first
+
+
+def _stop_process(process: subprocess.Popen) -> None:
+    # The server runs in its own session, so signal the whole group to reach children of a shell.
+    if os.name == "nt":
+        process.terminate()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=_LLM_STOP_TIMEOUT_SECONDS)
+    except ProcessLookupError:
+        return
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
 
 def main() -> None:
     repo_path = os.path.abspath(os.getcwd())
@@ -30,19 +63,21 @@ def main() -> None:
     llm_process: subprocess.Popen | None = None
 
     data_dir = os.path.join(repo_path, ".lpm")
-    comm_log = CommLog(os.path.join(data_dir, "comm_log.jsonl"))
+    comm_log = CommLog(os.path.join(data_dir, "comm_log.jsonl"), trace=trace)
     system_message_path = os.path.join(data_dir, "system_message.txt")
-    if os.path.isfile(system_message_path):
-        with open(system_message_path, "r", encoding="utf-8") as handle:
-            shared_state.system_message = handle.read().strip()
+    system_message_file = Path(system_message_path)
+    if not shared_state.system_message:
+        try:
+            shared_state.system_message = system_message_file.read_text(encoding="utf-8").strip()
+        except OSError:
+            pass
     if not shared_state.system_message:
         shared_state.system_message = (
             "You are LocalProjectManager. Your job is to pursue project completion by "
             "engaging external agents to complete parts of the project."
         )
-        os.makedirs(data_dir, exist_ok=True)
-        with open(system_message_path, "w", encoding="utf-8") as handle:
-            handle.write(shared_state.system_message)
+        system_message_file.parent.mkdir(parents=True, exist_ok=True)
+        system_message_file.write_text(shared_state.system_message, encoding="utf-8")
     trace.add(
         TraceEvent(
             kind="context_system_message",
@@ -51,13 +86,19 @@ def main() -> None:
         )
     )
 
-    def is_llm_ready() -> bool:
-        url = f"{config.llm.base_url.rstrip('/')}/v1/models"
+    llm_url = urlsplit(config.llm.base_url)
+    probe_class = http.client.HTTPSConnection if llm_url.scheme == "https" else http.client.HTTPConnection
+    probe_path = f"{llm_url.path.rstrip('/')}/v1/models"
+
+    def is_llm_ready(timeout: float = 2.0) -> bool:
+        conn = probe_class(llm_url.hostname or "localhost", llm_url.port, timeout=timeout)
         try:
-            response = requests.get(url, timeout=2)
-            return response.status_code == 200
-        except requests.RequestException:
+            conn.request("GET", probe_path)
+            return conn.getresponse().status == 200
+        except (OSError, http.client.HTTPException):
             return False
+        finally:
+            conn.close()
 
     llm = LlmClient(config.llm, trace=trace)
     compression = CompressionPipeline(config.compression, llm, trace=trace)
@@ -84,44 +125,76 @@ def main() -> None:
             return "Model not ready yet."
         if loop_thread and loop_thread.is_alive():
             return "Loop already running."
-        try:
-            if not shared_state.session_id:
-                shared_state.session_id = jules.resolve_session_id_for_source(shared_state.selected_source)
-            session_id = jules.start_session(
-                "Start session.",
-                session_id=shared_state.session_id,
-                source=shared_state.selected_source,
-            )
-            if session_id:
-                shared_state.session_id = session_id
-        except Exception as exc:
-            return f"Session start failed: {exc}"
-        loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        loop_thread = threading.Thread(target=run_loop, daemon=True)
         loop_thread.start()
-        return "Loop started."
+        return "Loop starting."
+
+    def run_loop() -> None:
+        if loop.bootstrap_session():
+            loop.run_forever()
+
+    sources_cache: list = [0.0, None]
 
     def fetch_sources() -> list[dict]:
+        now = time.monotonic()
+        if sources_cache[1] is not None and now - sources_cache[0] < _SOURCES_TTL_SECONDS:
+            return sources_cache[1]
         try:
             sources = jules.list_sources()
             trace.add(TraceEvent(kind="jules_sources", message="Sources loaded", payload={"count": len(sources)}))
+            sources_cache[0], sources_cache[1] = now, sources
             return sources
         except Exception as exc:
             trace.add(TraceEvent(kind="jules_sources_error", message="Failed to load sources", payload={"error": str(exc)}))
             raise
 
+    status_cache: tuple[int, dict] | None = None
+
     def status_payload() -> dict:
-        return {
+        nonlocal status_cache
+        cached = status_cache
+        version = shared_state.status_version
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        payload = {
             "llm_ready": shared_state.llm_ready,
             "selected_source": shared_state.selected_source,
             "session_id": shared_state.session_id,
             "system_message_locked": shared_state.system_message_locked,
         }
+        # Version and dict are published together as one tuple, so threads never see a mismatched pair.
+        status_cache = (version, payload)
+        return payload
+
+    def publish_status() -> None:
+        trace.add(TraceEvent(kind="status", message="Status updated", payload=status_payload()))
+
+    # Every change to a status field reaches the UI, whichever thread made it.
+    shared_state.status_listener = publish_status
 
     dump_dir = os.path.join(repo_path, "dump")
+    dump_queue: queue.Queue[tuple[str, dict]] = queue.Queue()
+
+    def dump_worker() -> None:
+        while True:
+            path, payload = dump_queue.get()
+            try:
+                data = fastjson.dumps_indented(payload)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb", buffering=1 << 20) as handle:
+                    handle.write(data)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as exc:
+                trace.add(TraceEvent(kind="dump_error", message="Dump failed", payload={"path": path, "error": str(exc)}))
+
+    threading.Thread(target=dump_worker, name="lpm-dump", daemon=True).start()
 
     def dump_state() -> str:
         os.makedirs(dump_dir, exist_ok=True)
-        timestamp = datetime.now().astimezone().strftime("%Y%m%d-%H%M%S")
+        now = time.time()
+        local = time.localtime(now)
+        offset = time.strftime("%z", local)
+        timestamp = time.strftime("%Y%m%d-%H%M%S", local)
         filename = f"dump-{timestamp}.json"
         path = os.path.join(dump_dir, filename)
         agent_output = None
@@ -132,7 +205,10 @@ def main() -> None:
                 "mess_out_LOG": shared_state.last_agent_output.mess_out_log,
             }
         payload = {
-            "timestamp": datetime.now().astimezone().isoformat(),
+            "timestamp": (
+                f"{time.strftime('%Y-%m-%dT%H:%M:%S', local)}.{int(now % 1 * 1_000_000):06d}"
+                f"{offset[:3]}:{offset[3:]}"
+            ),
             "context": {
                 "system_message": shared_state.system_message,
                 "comm_channel": shared_state.comm_channel,
@@ -140,19 +216,10 @@ def main() -> None:
                 "rolling_context": shared_state.rolling_context,
             },
             "agent_output": agent_output,
-            "trace": [
-                {
-                    "kind": event.kind,
-                    "message": event.message,
-                    "payload": event.payload,
-                    "timestamp": event.timestamp,
-                }
-                for event in trace.snapshot()
-            ],
+            "trace": trace.snapshot_columns(),
             "comm_log": comm_log.snapshot(),
         }
-        with open(path, "w", encoding="utf-8") as handle:
-            handle.write(json.dumps(payload, ensure_ascii=True, indent=2))
+        dump_queue.put((path, payload))
         return path
 
     ui = UiServer(
@@ -167,6 +234,8 @@ def main() -> None:
         comm_log=comm_log,
         system_message_path=system_message_path,
         dump_handler=dump_state,
+        fsync_writes=config.ui.fsync_writes,
+        http_threads=config.ui.http_threads,
     )
     ui.attach_trace_hook()
     ui.start_in_background()
@@ -175,19 +244,44 @@ def main() -> None:
 
     if config.llm.start_cmd:
         trace.add(TraceEvent(kind="startup", message="Starting llama.cpp server"))
-        llm_process = subprocess.Popen(
-            config.llm.start_cmd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-        )
+        start_cmd = config.llm.start_cmd
+        use_shell = _needs_shell(start_cmd)
+        # Windows takes the command line as-is; POSIX needs it split into argv unless a shell is required.
+        args = start_cmd if use_shell or os.name == "nt" else shlex.split(start_cmd)
+        listening = threading.Event()
+        try:
+            llm_process = subprocess.Popen(
+                args,
+                shell=use_shell,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        except OSError as exc:
+            trace.add(TraceEvent(kind="startup", message="Failed to start llama.cpp server", payload={"error": str(exc)}))
+        else:
+            output = llm_process.stdout
+
+            def watch_llm_output() -> None:
+                # Keep draining after the banner so a full pipe never blocks the server.
+                for line in iter(output.readline, b""):
+                    if not listening.is_set() and b"listening" in line:
+                        listening.set()
+
+            threading.Thread(target=watch_llm_output, name="llm-output", daemon=True).start()
         wait_until = time.time() + config.llm.start_wait_seconds
+        delay = 0.1
         while time.time() < wait_until:
-            if is_llm_ready():
+            if is_llm_ready(timeout=0.5):
                 shared_state.llm_ready = True
                 trace.add(TraceEvent(kind="startup", message="llama.cpp server ready"))
                 break
-            time.sleep(1)
+            if listening.wait(delay):
+                # Probe right away once llama.cpp reports it is listening.
+                listening.clear()
+                delay = 0.1
+                continue
+            delay = min(delay * 2, 1.0)
         else:
             shared_state.llm_ready = False
             trace.add(TraceEvent(kind="startup", message="llama.cpp server did not respond in time"))
@@ -198,15 +292,26 @@ def main() -> None:
         else:
             trace.add(TraceEvent(kind="startup", message="LLM server not reachable"))
 
+    shutdown_event = threading.Event()
+
+    def request_shutdown(signum: int, frame: object) -> None:
+        trace.add(TraceEvent(kind="shutdown", message=f"{signal.Signals(signum).name} received"))
+        shutdown_event.set()
+
+    signal.signal(signal.SIGINT, request_shutdown)
+    signal.signal(signal.SIGTERM, request_shutdown)
+
     print("UI ready. Select a source and click Start.")
     try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        trace.add(TraceEvent(kind="shutdown", message="KeyboardInterrupt received"))
+        if os.name == "nt":
+            # Untimed waits are not interruptible on Windows, so the SIGINT handler would never run.
+            while not shutdown_event.wait(1.0):
+                pass
+        else:
+            shutdown_event.wait()
     finally:
         if llm_process:
-            llm_process.terminate()
+            _stop_process(llm_process)
         ui.shutdown()
 
 